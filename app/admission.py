@@ -0,0 +1,144 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """Richiesta rifiutata per sovraccarico; retry_after indica dopo quanti secondi riprovare."""
+
+    status = 429  # Codice HTTP della risposta.
+    error = 'Too many requests'
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        # Il valore dell'header Retry-After è un numero intero di secondi.
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Limita il ritmo delle richieste a `rate` al secondo, con raffiche fino a `burst`."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Consuma un token; restituisce 0 se concesso, altrimenti i secondi di attesa per il prossimo."""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class ConcurrencyLimiter:
+    """Limita le operazioni in esecuzione; quelle in eccesso attendono in una coda limitata.
+
+    Quando anche la coda è piena, o l'attesa supera `queue_timeout`, la
+    richiesta viene rifiutata subito invece di allungare la latenza di tutte.
+    """
+
+    def __init__(self, max_concurrent, max_queue=0, queue_timeout=0.5):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue  # Richieste al massimo in attesa di un posto libero.
+        self.queue_timeout = queue_timeout  # Attesa massima in coda (secondi).
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0  # Richieste rifiutate dall'avvio.
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Occupa un posto; restituisce False se la richiesta va rifiutata."""
+        with self._cond:
+            if self.active < self.max_concurrent:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self, message='Too many concurrent requests'):
+        """Esegue il blocco occupando un posto; solleva Overloaded se non ce ne sono."""
+        if not self.acquire():
+            raise Overloaded(message, self.queue_timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_status(self):
+        return {'active': self.active, 'queued': self.waiting, 'rejected': self.rejected,
+                'max_concurrent': self.max_concurrent, 'max_queue': self.max_queue}
+
+
+class AdmissionController:
+    """Controllo di ammissione delle richieste API.
+
+    Ogni token ha un proprio token bucket (se `rate` è impostato) e tutte le
+    richieste condividono un limite di concorrenza con coda limitata. Le
+    richieste in eccesso vengono rifiutate con Overloaded, che le route
+    traducono in una risposta 429 con Retry-After.
+    """
+
+    def __init__(self, max_concurrent=64, max_queue=128, queue_timeout=0.5, rate=None, burst=None,
+                 clock=time.monotonic):
+        self.limiter = ConcurrencyLimiter(max_concurrent, max_queue, queue_timeout)
+        self.rate = rate  # Richieste al secondo per token (None = nessun limite).
+        self.burst = burst
+        self.clock = clock
+        self.rate_limited = 0  # Richieste rifiutate dal rate limit dall'avvio.
+        self._buckets = {}  # token -> TokenBucket
+        self._lock = threading.Lock()
+
+    def _bucket(self, token):
+        with self._lock:
+            if token not in self._buckets:
+                self._buckets[token] = TokenBucket(self.rate, self.burst, self.clock)
+            return self._buckets[token]
+
+    def admit(self, token):
+        """Ammette una richiesta del token o solleva Overloaded; va seguita da release()."""
+        if self.rate is not None:
+            wait_time = self._bucket(token).try_acquire()
+            if wait_time:
+                self.rate_limited += 1
+                raise Overloaded('Rate limit exceeded', wait_time)
+        if not self.limiter.acquire():
+            raise Overloaded('Server is overloaded', self.limiter.queue_timeout)
+
+    def release(self):
+        self.limiter.release()
+
+    def get_status(self):
+        return {**self.limiter.get_status(), 'rate_limited': self.rate_limited}
@@ -1,5 +1,7 @@
 import hashlib
 import bisect
+import threading
+from contextlib import nullcontext
 
 class ConsistentHash:
     def __init__(self, nodes=None, replicas=None):
@@ -8,6 +10,7 @@ class ConsistentHash:
         self.sorted_keys = []  # Lista ordinata per la ricerca binaria
         self.key_assignments = {}  # Traccia key -> nodo assegnato
         self.temp_key_storage = {}  # Traccia chiavi spostate temporaneamente durante il fallimento
+        self._temp_lock = threading.Lock()  # Protegge temp_key_storage durante fallimenti e recuperi concorrenti
         if nodes:
             for node in nodes:
                 self.add_node(node)
@@ -87,59 +90,71 @@ class ConsistentHash:
 
         return None  # Se non trova nodi validi
 
-    def redistribute_keys(self, node):
+    def redistribute_keys(self, node, key_lock=None):
         """Ridistribuisce le chiavi di un nodo fallito al successivo nodo attivo."""
+        key_lock = key_lock or (lambda key: nullcontext())  # Lock della singola chiave spostata
         # Ottieni il nodo successivo per tutte le chiavi del nodo fallito
         next_node = self.get_next_node(f'{node.node_id}:0', exclude_node_id=node.node_id)  # Il nodo successivo nel ring
 
         if next_node:
             print(f"Redistribuzione delle chiavi del nodo {node.node_id} al nodo {next_node.node_id}")
-            for key, value in node.get_all_keys():  # Recupera tutte le chiavi dal nodo fallito
-                # Controlla se il nodo successivo ha già la chiave
-                if not next_node.key_exists(key):
-                    # Se la chiave non esiste nel nodo successivo, spostala
-                    next_node.write(key, value)  # Scrivi la chiave nel nuovo nodo
-                    self.temp_key_storage[key] = (next_node.node_id, value)  # Traccia la chiave spostata con il valore
-                    print(f"Chiave '{key}' scritta nel nodo {next_node.node_id}.")
-                else:
-                    print(f"La chiave '{key}' esiste già nel nodo {next_node.node_id}, nessuna scrittura necessaria.")
-
-    def recover_node(self, node):
+            for key, value, version, expires_at in node.get_all_records():  # Recupera tutte le chiavi dal nodo fallito
+                with key_lock(key):
+                    # Controlla se il nodo successivo ha già la chiave
+                    if not next_node.key_exists(key):
+                        # Se la chiave non esiste nel nodo successivo, spostala mantenendone versione e scadenza
+                        next_node.write(key, value, version, expires_at)  # Scrivi la chiave nel nuovo nodo
+                        with self._temp_lock:
+                            # Traccia la chiave spostata
+                            self.temp_key_storage[key] = (next_node.node_id, value, version, expires_at)
+                        print(f"Chiave '{key}' scritta nel nodo {next_node.node_id}.")
+                    else:
+                        print(f"La chiave '{key}' esiste già nel nodo {next_node.node_id}, nessuna scrittura necessaria.")
+
+    def recover_node(self, node, key_lock=None):
         """Recupera un nodo e ripristina le sue chiavi, rimuovendo le chiavi dai nodi ospitanti solo se necessario."""
+        key_lock = key_lock or (lambda key: nullcontext())  # Lock della singola chiave ripristinata
         print(f"Recupero node {node.node_id}...")
 
         # Trova le chiavi che sono state spostate temporaneamente
-        keys_to_recover = [
-            key for key, (temp_node_id, value) in self.temp_key_storage.items()
-            if temp_node_id != node.node_id #solo se chiavi non sono già presenti nel nodo
-        ]
+        with self._temp_lock:
+            keys_to_recover = [
+                key for key, (temp_node_id, *record) in self.temp_key_storage.items()
+                if temp_node_id != node.node_id #solo se chiavi non sono già presenti nel nodo
+            ]
         print(f"Chiavi da recuperare: {keys_to_recover}")
 
         for key in keys_to_recover: # per ogni chiave da recuperare
-            temp_node_id, value = self.temp_key_storage[key] # Ottieni ID nodo ospitante e il valore
-            temp_node = self.get_node_by_id(temp_node_id) # Ottieni il nodo ospitante usando suo ID
-
-            # Verifica se la chiave è una replica naturale del nodo
-            naturally_responsible_nodes = self.get_nodes_for_key(key) # Nodi responsabili per la replica della chiave
-            if temp_node and temp_node_id != node.node_id: # Se il nodo ospitante è diverso dal nodo recuperato
-                print(f"Ripristino della chiave '{key}' nel nodo {node.node_id} dal nodo ospitante {temp_node_id}...")
-
-                # Elimina la chiave solo se non è una replica naturale del nodo
-                if temp_node not in naturally_responsible_nodes:
-                    print(f"Eliminazione della chiave '{key}' dal nodo ospitante {temp_node_id} perché non è una replica originaria.")
-                    temp_node.delete(key)  # Elimina dal DB del nodo ospitante
-                else:
-                    print(f"Saltata eliminazione della chiave '{key}' sul nodo {temp_node_id}, è una replica originaria.")
-
-                # Scrivi la chiave e il valore nel nodo recuperato, solo se non esiste già
-                if not node.key_exists(key):
-                    print(f"Scrittura della chiave  '{key}' nel nodo recuperato {node.node_id}.")
-                    node.write(key, value)
-                else:
-                    print(f"La chiave '{key}' esiste già nel nodo {node.node_id}, salto la scrittura.")
-
-                # Rimuovi la chiave dalla memoria temporanea
-                del self.temp_key_storage[key]
+            with key_lock(key):
+                with self._temp_lock:
+                    entry = self.temp_key_storage.get(key)
+                if entry is None:  # Chiave già ripristinata da un recupero concorrente
+                    continue
+                temp_node_id, value, version, expires_at = entry # Ottieni ID nodo ospitante, valore, versione e scadenza
+                temp_node = self.get_node_by_id(temp_node_id) # Ottieni il nodo ospitante usando suo ID
+
+                # Verifica se la chiave è una replica naturale del nodo
+                naturally_responsible_nodes = self.get_nodes_for_key(key) # Nodi responsabili per la replica della chiave
+                if temp_node and temp_node_id != node.node_id: # Se il nodo ospitante è diverso dal nodo recuperato
+                    print(f"Ripristino della chiave '{key}' nel nodo {node.node_id} dal nodo ospitante {temp_node_id}...")
+
+                    # Elimina la chiave solo se non è una replica naturale del nodo
+                    if temp_node not in naturally_responsible_nodes:
+                        print(f"Eliminazione della chiave '{key}' dal nodo ospitante {temp_node_id} perché non è una replica originaria.")
+                        temp_node.purge(key)  # Elimina dal DB del nodo ospitante (senza tombstone)
+                    else:
+                        print(f"Saltata eliminazione della chiave '{key}' sul nodo {temp_node_id}, è una replica originaria.")
+
+                    # Scrivi la chiave e il valore nel nodo recuperato, solo se non esiste già
+                    if not node.key_exists(key):
+                        print(f"Scrittura della chiave  '{key}' nel nodo recuperato {node.node_id}.")
+                        node.write(key, value, version, expires_at)
+                    else:
+                        print(f"La chiave '{key}' esiste già nel nodo {node.node_id}, salto la scrittura.")
+
+                    # Rimuovi la chiave dalla memoria temporanea
+                    with self._temp_lock:
+                        self.temp_key_storage.pop(key, None)
 
         print(f"Recupero del nodo {node.node_id} completato.")
 
@@ -0,0 +1,51 @@
+import threading
+import time
+
+
+class ExpiryReaper:
+    """Elimina in background le chiavi scadute da tutti i nodi.
+
+    Le letture ignorano già i record scaduti (scadenza pigra); il reaper ne
+    libera lo spazio a batch limitati, così ogni giro tiene occupato lo storage
+    di un nodo solo per poco tempo. Poiché la scadenza è un istante assoluto
+    scritto identico su ogni replica, tutte le repliche scadono insieme.
+    """
+
+    def __init__(self, manager, interval=1.0, batch_size=500, max_batches=10):
+        self.manager = manager
+        self.interval = interval  # Intervallo tra due giri del reaper (secondi).
+        self.batch_size = batch_size  # Chiavi eliminate al massimo per batch e per nodo.
+        self.max_batches = max_batches  # Batch al massimo per nodo in un giro; il resto al giro successivo.
+        self.expired_keys = 0  # Chiavi eliminate dall'avvio.
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Avvia il reaper in un thread in background."""
+        self._thread = threading.Thread(target=self._run, daemon=True, name='expiry-reaper')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"Expiry reaper error: {e}")
+
+    def reap(self, now=None):
+        """Esegue un giro su tutti i nodi attivi e restituisce il numero di chiavi eliminate."""
+        now = time.time() if now is None else now
+        deleted = 0
+        for node in self.manager.nodes:
+            for _ in range(self.max_batches):
+                count = node.delete_expired(now, self.batch_size)
+                deleted += count
+                if count < self.batch_size:
+                    break
+        self.expired_keys += deleted
+        return deleted
@@ -0,0 +1,147 @@
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class PhiAccrualEstimator:
+    """Stima phi-accrual del sospetto di fallimento di un singolo nodo.
+
+    phi = -log10(P(il prossimo heartbeat arrivi ancora più tardi)), calcolata
+    assumendo una distribuzione normale degli intervalli tra heartbeat.
+    Phi cresce in modo continuo con il ritardo, quindi la soglia si adatta da
+    sola alla variabilità osservata degli intervalli.
+    """
+
+    def __init__(self, window=100, min_std=0.1):
+        self.intervals = deque(maxlen=window)  # Ultimi intervalli tra heartbeat (secondi).
+        self.min_std = min_std  # Limite inferiore della deviazione standard, evita phi infiniti con intervalli regolari.
+        self.last_heartbeat = None
+
+    def heartbeat(self, now):
+        if self.last_heartbeat is not None:
+            self.intervals.append(now - self.last_heartbeat)
+        self.last_heartbeat = now
+
+    def phi(self, now):
+        if self.last_heartbeat is None or not self.intervals:
+            return 0.0
+        mean = sum(self.intervals) / len(self.intervals)
+        variance = sum((interval - mean) ** 2 for interval in self.intervals) / len(self.intervals)
+        std = max(math.sqrt(variance), self.min_std)
+        y = (now - self.last_heartbeat - mean) / std
+        p_later = 0.5 * math.erfc(y / math.sqrt(2))
+        return -math.log10(max(p_later, 1e-300))
+
+
+class FailureDetector:
+    """Rileva automaticamente nodi lenti o non raggiungibili tramite heartbeat.
+
+    A ogni giro invia un heartbeat a ciascun nodo (senza attendere oltre
+    `timeout` i nodi lenti) e classifica i nodi come 'alive', 'suspect' o
+    'dead'. I nodi sospetti vengono marcati in modo che le letture li evitino;
+    i nodi morti vengono fatti fallire tramite il ReplicationManager e
+    recuperati automaticamente quando tornano a rispondere.
+    """
+
+    def __init__(self, manager, interval=1.0, timeout=None, suspect_phi=3.0, dead_phi=8.0, slow_latency=0.25,
+                 clock=time.monotonic):
+        self.manager = manager
+        self.interval = interval  # Intervallo tra due giri di heartbeat (secondi).
+        self.timeout = timeout if timeout is not None else interval  # Attesa massima delle risposte per giro.
+        self.suspect_phi = suspect_phi  # Oltre questa soglia il nodo è sospetto.
+        self.dead_phi = dead_phi  # Oltre questa soglia il nodo è considerato morto.
+        self.slow_latency = slow_latency  # Latenza di heartbeat (EWMA) oltre cui un nodo è sospetto anche se risponde.
+        self.clock = clock
+        self.estimators = {node.node_id: PhiAccrualEstimator(min_std=interval / 4) for node in manager.nodes}
+        self.latency = {node.node_id: 0.0 for node in manager.nodes}  # EWMA della latenza degli heartbeat.
+        self.states = {node.node_id: 'alive' for node in manager.nodes}
+        self.auto_failed = set()  # Nodi fatti fallire dal detector, da recuperare automaticamente.
+        self._pending = {}  # node_id -> heartbeat ancora in corso.
+        self._executor = ThreadPoolExecutor(max_workers=max(len(manager.nodes), 1), thread_name_prefix='heartbeat')
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Avvia il giro di heartbeat periodico in un thread in background."""
+        start_time = self.clock()
+        for estimator in self.estimators.values():
+            estimator.heartbeat(start_time)
+        self._thread = threading.Thread(target=self._run, daemon=True, name='failure-detector')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=False)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Failure detector error: {e}")
+
+    def _heartbeat(self, node):
+        start_time = time.perf_counter()
+        node.heartbeat()
+        return time.perf_counter() - start_time
+
+    def tick(self):
+        """Esegue un giro di heartbeat e aggiorna lo stato dei nodi."""
+        for node in self.manager.nodes:
+            if node.node_id not in self._pending:  # Un nodo lento non accumula heartbeat arretrati.
+                self._pending[node.node_id] = self._executor.submit(self._heartbeat, node)
+        wait(list(self._pending.values()), timeout=self.timeout)
+
+        now = self.clock()
+        responded = set()
+        for node_id, future in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[node_id]
+            try:
+                latency = future.result()
+            except Exception:
+                continue  # Heartbeat fallito: conta come heartbeat mancato.
+            self.estimators[node_id].heartbeat(now)
+            self.latency[node_id] = 0.3 * latency + 0.7 * self.latency[node_id]
+            responded.add(node_id)
+
+        for node in self.manager.nodes:
+            self._update(node, now, node.node_id in responded)
+
+    def _update(self, node, now, responded):
+        phi = self.estimators[node.node_id].phi(now)
+        if phi >= self.dead_phi:
+            state = 'dead'
+        elif phi >= self.suspect_phi or self.latency[node.node_id] >= self.slow_latency:
+            state = 'suspect'
+        else:
+            state = 'alive'
+        previous = self.states[node.node_id]
+        self.states[node.node_id] = state
+        node.suspect = state != 'alive'  # Le letture evitano i nodi sospetti finché esistono alternative.
+
+        if state == 'dead' and node.is_alive():
+            print(f"Failure detector: node {node.node_id} is dead (phi={phi:.1f}), failing it")
+            self.auto_failed.add(node.node_id)
+            self.manager.fail_node(node.node_id)
+        elif responded and state != 'dead' and node.node_id in self.auto_failed:
+            print(f"Failure detector: node {node.node_id} is back (was {previous}), recovering it")
+            self.auto_failed.discard(node.node_id)
+            # La pausa dovuta al guasto non deve gonfiare la stima degli intervalli futuri.
+            self.estimators[node.node_id] = PhiAccrualEstimator(min_std=self.interval / 4)
+            self.estimators[node.node_id].heartbeat(now)
+            self.manager.recover_node(node.node_id)
+
+    def get_status(self, node_id):
+        """Restituisce lo stato rilevato per un nodo."""
+        now = self.clock()
+        return {
+            'health': self.states[node_id],
+            'phi': round(self.estimators[node_id].phi(now), 3),
+            'heartbeat_latency_ms': round(self.latency[node_id] * 1000, 3),
+        }
@@ -0,0 +1,78 @@
+import threading
+import zlib
+from contextlib import contextmanager
+
+
+class StripedLock:
+    """Insieme fisso di lock a cui le chiavi vengono assegnate tramite hash.
+
+    Due operazioni sulla stessa chiave si escludono a vicenda, mentre operazioni
+    su chiavi che cadono in stripe diverse procedono in parallelo.
+    """
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def _stripe(self, key):
+        return zlib.crc32(key.encode('utf-8')) % len(self._locks)
+
+    def lock(self, key):
+        """Restituisce il lock della stripe a cui appartiene la chiave."""
+        return self._locks[self._stripe(key)]
+
+    @contextmanager
+    def lock_many(self, keys):
+        """Acquisisce le stripe di più chiavi in ordine crescente, evitando deadlock."""
+        stripes = sorted({self._stripe(key) for key in keys})
+        for stripe in stripes:
+            self._locks[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self._locks[stripe].release()
+
+
+class ReadWriteLock:
+    """Lock lettori-scrittore con preferenza per gli scrittori.
+
+    Le operazioni sui dati acquisiscono il lock in lettura e procedono in
+    parallelo; i cambi di topologia (fallimento, recupero, strategia) lo
+    acquisiscono in scrittura. Il lock non è rientrante.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read_lock(self):
+        with self._cond:
+            # I nuovi lettori attendono anche gli scrittori in coda, così questi non restano a digiuno.
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write_lock(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
@@ -1,186 +1,936 @@
-import sqlite3
+import base64
+import json
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack, nullcontext
+from .admission import ConcurrencyLimiter, Overloaded
 from .consistent_hash import ConsistentHash
+from .expiry import ExpiryReaper
+from .failure_detector import FailureDetector
+from .locks import ReadWriteLock, StripedLock
+from .replication_log import ReplicationLog
+from .routing import create_router
+from .storage import create_engine, snapshot_files
+from .tracing import bind_context, span
+
+ANY = object()  # Valore atteso non specificato in compare_and_set.
+# Per quanto tempo (secondi) un nodo ricorda una cancellazione: un nodo rimasto fuori dal cluster più a lungo
+# può far rivivere le chiavi cancellate nel frattempo.
+TOMBSTONE_TTL = 24 * 3600
+CHUNK_PREFIX = '__chunks__/'  # Prefisso riservato ai record dei valori a chunk.
+
+
+class QuorumUnavailable(Overloaded):
+    """Scrittura rifiutata perché le repliche attive sono meno del quorum di scrittura richiesto."""
+
+    status = 503
+    error = 'Service unavailable'
+
+
+def manifest_key(key):
+    # Record che descrive il valore a chunk della chiave (versione, numero di chunk, dimensione).
+    return f'{CHUNK_PREFIX}{key}'
+
+
+def chunk_key(key, version, index):
+    # Record di un singolo chunk; la versione nel nome separa i chunk di scritture diverse.
+    return f'{CHUNK_PREFIX}{key}/{version}/{index}'
+
+
+def placement_key(record_key):
+    # Chiave che decide su quali nodi si trova un record: manifest e chunk seguono la chiave del valore.
+    if not record_key.startswith(CHUNK_PREFIX):
+        return record_key
+    key = record_key[len(CHUNK_PREFIX):]
+    parts = key.rsplit('/', 2)
+    if len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+        return parts[0]
+    return key
 
 
 class ReplicaNode:
-    def __init__(self, node_id, port):
+    def __init__(self, node_id, port, storage_engine='sqlite', db_dir='db', change_log_size=10000, limits=None,
+                 partitions=1, lazy=False):
         # Inizializza un nodo replica con un identificatore univoco e una porta.
         self.node_id = node_id
         self.port = port
-        self.name_db = f'replica_{node_id}.db'  # Nome del file del database per questo nodo.
-        self.db_path = os.path.join('db', self.name_db)  # Percorso del file del database per questo nodo.
+        self.db_dir = db_dir  # Directory che contiene i dati dei nodi.
+        self.storage_engine = storage_engine  # Tipo di motore di storage ('sqlite', 'log', 'memory').
+        self.partitions = partitions  # Numero di partizioni (file indipendenti) in cui sono suddivise le chiavi.
+        self.name_db = f'replica_{node_id}'  # Nome base dei file di dati per questo nodo.
         self.alive = True  # Lo stato iniziale del nodo è attivo.
+        # Lo storage viene aperto da open(): subito, oppure più tardi dal ReplicationManager con lazy=True.
+        # Finché non è pronto il nodo non serve richieste (is_alive() restituisce False).
+        self.engine = None
+        self.db_path = None  # Percorso del file dei dati per questo nodo.
+        self.ready = threading.Event()
+        self.startup_time = None  # Tempo impiegato ad aprire lo storage (secondi).
+        # Contatori di carico usati dall'instradamento delle letture.
+        self.in_flight = 0  # Letture attualmente in corso sul nodo.
+        self.reads = 0  # Letture servite dall'avvio.
+        self.latency_ewma = 0.0  # Media mobile esponenziale della latenza di lettura (secondi).
+        self._stats_lock = threading.Lock()
+        # Stato usato dal failure detector e iniezione di guasti per simulare nodi lenti o irraggiungibili.
+        self.suspect = False  # Impostato dal failure detector quando il nodo risponde lentamente o in ritardo.
+        self.reachable = True  # False simula un nodo che non risponde (crash o partizione di rete).
+        self.fault_delay = 0.0  # Latenza aggiuntiva (secondi) su ogni operazione, simula un nodo lento.
+        # Log delle modifiche recenti, usato per allineare un nodo avviato da uno snapshot di questo nodo.
+        self.change_seq = 0  # Numero di sequenza dell'ultima modifica applicata.
+        self.change_log = deque(maxlen=change_log_size)  # (seq, op, key, value, version, expires_at)
+        self._change_floor = 0  # Le modifiche con seq <= floor non sono più ricostruibili dal log.
+        self._change_lock = threading.Lock()
+        # Coda di lavoro limitata per le richieste dei client (None = nessun limite).
+        self.work_queue = ConcurrencyLimiter(**limits) if limits else None
+        if not lazy:
+            self.open()
+            self.ready.set()
+
+    def open(self):
+        # Apre (o crea) lo storage; non rende il nodo pronto, lo fa chi lo ha avviato.
+        start_time = time.perf_counter()
         self.create_db_directory()  # Crea la directory 'db' se non esiste già.
-        self._initialize_db()  # Inizializza il db se non esiste già-
+        self.engine = create_engine(self.storage_engine, os.path.join(self.db_dir, self.name_db), self.partitions)
+        self.db_path = self.engine.path
+        self.startup_time = time.perf_counter() - start_time
 
     def create_db_directory(self):
-        # Crea la directory 'db' se non esiste già.
-        if not os.path.exists('db'):
-            os.makedirs('db')  # Crea la directory.
-
-    def _initialize_db(self):
-        # Crea la tabella 'kv_store' se non esiste già nel database.
-        if not os.path.exists(self.db_path):
-            conn = sqlite3.connect(self.db_path)  # Si connette al db
-            cursor = conn.cursor()  # Crea un cursore per eseguire comandi SQL.
-            cursor.execute(
-                '''CREATE TABLE IF NOT EXISTS kv_store (key TEXT PRIMARY KEY, value TEXT)''')  # Crea la tabella
-            conn.commit()  # Committa sul db
-            conn.close()  # Chiude la connessione al db.
-
-    def write(self, key, value):
-        # Scrive una coppia chiave-valore nel database solo se il nodo è attivo.
-        if self.alive:
-            conn = sqlite3.connect(self.db_path)  # Si connette al db
-            cursor = conn.cursor()  # Crea un cursore per eseguire comandi SQL.
-            cursor.execute('''INSERT OR REPLACE INTO kv_store (key, value) VALUES (?, ?)''',
-                           (key, value))  # Inserts or updates the data.
-            conn.commit()  # Committa sul db
-            conn.close()  # Chiude la connessione al db.
+        # Crea la directory 'db' se non esiste già (anche con più nodi avviati in parallelo).
+        os.makedirs(self.db_dir, exist_ok=True)
+
+    def write(self, key, value, version=None, expires_at=None):
+        # Scrive una coppia chiave-valore nello storage solo se il nodo è attivo.
+        # Senza una versione esplicita viene usato il timestamp corrente (in nanosecondi);
+        # expires_at è l'istante assoluto di scadenza (None = nessuna scadenza).
+        if self.is_alive():
+            with span('node.write', node=self.node_id):
+                self._inject_delay()
+                version = version if version is not None else time.time_ns()
+                self.engine.write(key, value, version, expires_at)
+                self._log_change('write', key, value, version, expires_at)
+
+    def write_if_newer(self, key, value, version, expires_at=None):
+        # Scrive la coppia solo se più recente della copia locale (usato dal read repair).
+        # Con value=None scrive un tombstone: la cancellazione vince solo sulle copie più vecchie.
+        if not self.is_alive():
+            return False
+        with span('node.write_if_newer', node=self.node_id):
+            if self.engine.write_if_newer(key, value, version, expires_at):
+                self._log_change('write' if value is not None else 'delete', key, value, version, expires_at)
+                return True
+        return False
+
+    def apply_changes(self, changes):
+        # Applica in modo idempotente una sequenza di modifiche replicate (op, chiave, valore, versione, scadenza)
+        # con un'unica scrittura a batch: le cancellazioni diventano tombstone, quindi sia le scritture sia le
+        # cancellazioni vincono solo sulle copie più vecchie.
+        if not self.is_alive():
+            raise ConnectionError(f'Node {self.node_id} is not alive')
+        # Le rimozioni fisiche ('purge') spostano una copia, non cancellano la chiave: non si replicano.
+        self._write_batch([self._change_row(*change) for change in changes if change[0] in ('write', 'delete')])
+        for change in changes:
+            if change[0] == 'drop':
+                self.drop(change[1])  # Dopo il batch: un chunk viene sempre rimosso dopo essere stato scritto.
+
+    def apply_change(self, op, key, value, version, expires_at):
+        # Applica una singola modifica replicata (vedi apply_changes); restituisce True se ha modificato il nodo.
+        if op == 'purge':
+            return False  # Una copia spostata altrove, non una cancellazione.
+        if op == 'drop':
+            self.drop(key)
+            return True
+        return self.write_if_newer(*self._change_row(op, key, value, version, expires_at))
+
+    @staticmethod
+    def _change_row(op, key, value, version, expires_at):
+        # Record (chiave, valore, versione, scadenza) equivalente a una modifica replicata.
+        if op == 'write':
+            return key, value, version, expires_at
+        return key, None, version, time.time() + TOMBSTONE_TTL
+
+    def _write_batch(self, rows):
+        if rows:
+            self._inject_delay()
+            self.engine.write_batch(rows)
+            for key, value, version, expires_at in rows:
+                # Riapplicare una modifica non vincente è innocuo.
+                self._log_change('write' if value is not None else 'delete', key, value, version, expires_at)
+
+    def _log_change(self, op, key, value=None, version=None, expires_at=None):
+        # Registra una modifica già applicata allo storage; il seq viene assegnato dopo la scrittura, quindi
+        # ogni modifica con seq <= S è visibile a uno snapshot iniziato dopo aver letto S.
+        # Per le scritture viene registrato solo un riferimento ('ref': chiave e versione): il valore viene
+        # riletto dallo storage da changes_since(), così la memoria del log non dipende dalla dimensione
+        # dei valori (chunk compresi).
+        if op == 'write':
+            op, value, expires_at = 'ref', None, None
+        with self._change_lock:
+            self.change_seq += 1
+            if len(self.change_log) == self.change_log.maxlen:
+                self._change_floor = self.change_log[0][0]  # La modifica più vecchia sta per essere scartata.
+            self.change_log.append((self.change_seq, op, key, value, version, expires_at))
+
+    def changes_since(self, seq):
+        # Restituisce le modifiche successive a seq, oppure None se il log non risale più fino a seq.
+        with self._change_lock:
+            if seq < self._change_floor:
+                return None
+            changes = [change for change in self.change_log if change[0] > seq]
+        return [change for change in map(self._resolve_change, changes) if change is not None]
+
+    def _resolve_change(self, change):
+        # Sostituisce il riferimento a una scrittura con la scrittura stessa, rileggendo il record.
+        # Se il record è già stato sostituito o eliminato la modifica viene scartata: il log contiene
+        # comunque la modifica successiva.
+        seq, op, key, _, version, _ = change
+        if op != 'ref':
+            return change
+        record = self.engine.read_record(key)
+        if record is None or record[1] != version:
+            return None
+        return seq, 'write', key, record[0], version, record[2]
 
     def read(self, key):
-        # Legge il valore associato a una chiave dal database solo se il nodo è attivo.
-        if self.alive:
-            conn = sqlite3.connect(self.db_path)  # Si connette al db
-            cursor = conn.cursor()  # Crea un cursore per eseguire comandi SQL.
-            cursor.execute('''SELECT value FROM kv_store WHERE key=?''', (key,))  # Seleziona la value per la key indicata.
-            result = cursor.fetchone()  # Recupera il risultato della query.
-            conn.close()  # Chiude la connessione al db.
-            return result[0] if result else None  # Restituisce il valore se trovato, altrimenti None.
-
-    def delete(self, key):
-        # Elimina la coppia chiave-valore dal database solo se il nodo è attivo.
-        if self.alive:
-            conn = sqlite3.connect(self.db_path)  #  Si connette al db
-            cursor = conn.cursor()  # Crea un cursore per eseguire comandi SQL.
-            cursor.execute('''DELETE FROM kv_store WHERE key=?''', (key,))  #Elimina la coppia chiave-valore dal database solo se il nodo è attivo.
-            conn.commit()  # Committa sul db
-            conn.close()  # Chiude la connessione al db.
+        # Legge il valore associato a una chiave solo se il nodo è attivo.
+        if self.is_alive():
+            return self._tracked_read(self.engine.read, key)  # Restituisce il valore se trovato, altrimenti None.
+
+    def read_record(self, key):
+        # Legge la tupla (valore, versione, scadenza) associata a una chiave solo se il nodo è attivo.
+        if self.is_alive():
+            return self._tracked_read(self.engine.read_record, key)
+
+    def read_version(self, key):
+        # Come read_record, ma restituisce anche un tombstone (valore None) con la versione della cancellazione.
+        if self.is_alive():
+            return self._tracked_read(self.engine.read_version, key)
+
+    def work_slot(self):
+        # Occupa un posto nella coda di lavoro del nodo; solleva Overloaded se la coda è piena.
+        if self.work_queue is None:
+            return nullcontext()
+        return self.work_queue.slot(f'Node {self.node_id} is overloaded')
+
+    def _tracked_read(self, read_function, key):
+        # Esegue una lettura aggiornando i contatori di carico del nodo.
+        with self.work_slot(), span('node.read', node=self.node_id):
+            return self._timed_read(read_function, key)
+
+    def _timed_read(self, read_function, key):
+        with self._stats_lock:
+            self.in_flight += 1
+        start_time = time.perf_counter()
+        try:
+            self._inject_delay()
+            return read_function(key)
+        finally:
+            self._record_read(time.perf_counter() - start_time)
+
+    def _record_read(self, latency, alpha=0.2):
+        # Aggiorna i contatori di carico al termine di una lettura.
+        with self._stats_lock:
+            self.in_flight -= 1
+            self.reads += 1
+            if self.reads == 1:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma = alpha * latency + (1 - alpha) * self.latency_ewma
+
+    def _inject_delay(self):
+        if self.fault_delay:
+            time.sleep(self.fault_delay)
+
+    def inject_fault(self, delay=0.0, reachable=True):
+        # Simula un nodo lento (delay) o irraggiungibile (reachable=False) per il failure detector.
+        self.fault_delay = delay
+        self.reachable = reachable
+
+    def heartbeat(self):
+        # Risponde a un heartbeat verificando che lo storage sia utilizzabile; solleva un'eccezione se irraggiungibile.
+        if not self.reachable:
+            raise ConnectionError(f'Node {self.node_id} is unreachable')
+        self._inject_delay()
+        if self.ready.is_set():  # Un nodo ancora in avvio risponde, ma non ha uno storage da verificare.
+            self.engine.key_exists('__heartbeat__')
+
+    def delete(self, key, version=None):
+        # Cancella la chiave solo se il nodo è attivo, lasciando un tombstone con la versione della cancellazione:
+        # una copia più vecchia ricevuta in seguito (recupero, read repair) non può far rivivere la chiave.
+        if self.is_alive():
+            with span('node.delete', node=self.node_id):
+                version = version if version is not None else time.time_ns()
+                expires_at = time.time() + TOMBSTONE_TTL
+                if self.engine.write_if_newer(key, None, version, expires_at):
+                    self._log_change('delete', key, None, version, expires_at)
+
+    def purge(self, key):
+        # Rimuove fisicamente la chiave senza lasciare un tombstone: usato quando una copia viene solo spostata
+        # su un altro nodo (ribilanciamento, fine di un hinted handoff), non cancellata.
+        if self.is_alive():
+            self.engine.delete(key)
+            self._log_change('purge', key)
+
+    def drop(self, key):
+        # Rimuove il record di un chunk senza tombstone: le chiavi dei chunk sono uniche per versione e non
+        # vengono mai riscritte, quindi nessuna copia più vecchia può farle rivivere. A differenza di 'purge'
+        # la rimozione ('drop') si replica.
+        if self.is_alive():
+            self.engine.delete(key)
+            self._log_change('drop', key)
 
     def key_exists(self, key):
-        # Verifica se una chiave esiste nel database solo se il nodo è attivo.
-        if self.alive:
-            conn = sqlite3.connect(self.db_path)  #  Si connette al db
-            cursor = conn.cursor()  # Crea un cursore per eseguire comandi SQL.
-            cursor.execute('''SELECT 1 FROM kv_store WHERE key=?''', (key,))  # Verifica se la chiave esiste.
-            exists = cursor.fetchone() is not None  # Verifica se è stata trovata almeno una riga.
-            conn.close()  # Chiude la connessione al db.
-            return exists  # Restituisce True se trovato, altrimenti False.
+        # Verifica se una chiave esiste nello storage solo se il nodo è attivo.
+        if self.is_alive():
+            with span('node.key_exists', node=self.node_id):
+                return self.engine.key_exists(key)  # Restituisce True se trovato, altrimenti False.
 
     def fail(self):
         # Simula il fallimento del nodo impostando il suo stato su inattivo.
         self.alive = False
 
-    def recover(self, active_nodes, strategy='full'):
+    def recover(self, active_nodes, strategy='full', key_lock=None):
         # Recupera il nodo e sincronizza i dati con gli altri nodi attivi.
         if not self.alive:
-            self.alive = True  # Setta il nodo attivo
+            self.resume()  # Setta il nodo attivo
             if strategy == 'full':
-                self.sync_with_active_nodes(active_nodes)  # Sincronizza con gli altri nodi attivi.
+                self.sync_with_active_nodes(active_nodes, key_lock)  # Sincronizza con gli altri nodi attivi.
+
+    def resume(self):
+        # Riporta il nodo attivo senza sincronizzarne i dati.
+        self.alive = True
 
     def is_alive(self):
-        # Restituisce lo stato corrente del nodo
-        return self.alive
+        # Restituisce lo stato corrente del nodo: attivo e con lo storage pronto.
+        return self.alive and self.ready.is_set()
 
-    def sync_with_active_nodes(self, active_nodes):
+    def sync_with_active_nodes(self, active_nodes, key_lock=None):
         # Sincronizza i dati del nodo con gli altri nodi attivi.
+        # key_lock(key) restituisce il lock della chiave: solo la chiave copiata viene bloccata, non l'intero nodo.
+        key_lock = key_lock or (lambda key: nullcontext())
+        peers = [node for node in active_nodes if node.is_alive() and node.node_id != self.node_id]
         all_keys = set()  # Inizializza un set per memorizzare tutte le chiavi.
-        for node in active_nodes:
-            if node.is_alive() and node.node_id != self.node_id:
-                conn = sqlite3.connect(node.db_path)  # Si connette al database dell'altro nodo.
-                cursor = conn.cursor()  #  Crea un cursore per eseguire comandi SQL.
-                cursor.execute('''SELECT key, value FROM kv_store''')  # Seleziona tutte le coppie key-valore.
-                rows = cursor.fetchall()  # Recupera tutte le righe.
-                conn.close()  # Chiude la connessione al db
-                for key, value in rows:
-                    self.write(key, value)  # Scrive ogni coppia chiave-valore nel database del nodo corrente.
-                    all_keys.add(key)  # Aggiunge la chiave all'insieme di tutte le chiavi.
-
-        # Recupera tutte le chiavi.
-        # si connette al nodo ricoverato e recupera tutte le chiavi al suo interno ,
-        conn = sqlite3.connect(self.db_path)  # Si connette al database del nodo corrente.
-        cursor = conn.cursor()  # Crea un cursore per eseguire comandi SQL.
-        cursor.execute('''SELECT key FROM kv_store''')  # Seleziona tutte le key
-        self_keys = cursor.fetchall()  # Recupera tutte le key
-        conn.close()  # Chiude la connessione al db.
+        for node in peers:
+            for key, value, version, expires_at in node.get_all_records():  # Recupera tutti i record dell'altro nodo.
+                with key_lock(key):
+                    self.write_if_newer(key, value, version, expires_at)  # Scrive il record se più recente.
+                all_keys.add(key)  # Aggiunge la chiave all'insieme di tutte le chiavi.
 
         # Rimuove le chiavi da self che non sono presenti negli altri nodi attivi.
-        for (key,) in self_keys:
+        for key, _ in self.get_all_keys():
             if key not in all_keys:
-                self.delete(key)  # Elimina la chiave dal database del nodo corrente.
+                with key_lock(key):
+                    # Ricontrolla sotto lock: la chiave potrebbe essere stata scritta dopo la copia.
+                    if not any(node.key_exists(key) for node in peers):
+                        self.delete(key)  # Elimina la chiave dal database del nodo corrente.
 
     def get_all_keys(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''SELECT key, value FROM kv_store''')
-        rows = cursor.fetchall()
-        conn.close()
-        return rows
+        # Restituisce tutte le coppie chiave-valore memorizzate nel nodo.
+        return self.engine.items()
+
+    def get_all_records(self):
+        # Restituisce tutti i record (chiave, valore, versione, scadenza) memorizzati nel nodo.
+        return self.engine.records()
+
+    def delete_expired(self, now, limit):
+        # Elimina fino a `limit` chiavi scadute; restituisce quante ne ha eliminate.
+        if self.is_alive():
+            return self.engine.delete_expired(now, limit)
+        return 0
+
+    def snapshot(self, dest_path):
+        # Crea uno snapshot online dello storage senza bloccare le scritture.
+        # Restituisce il seq da cui riprendere il log delle modifiche dopo il ripristino.
+        with self._change_lock:
+            seq = self.change_seq
+        self.engine.snapshot(dest_path)
+        return seq
+
+    def restore(self, src_path):
+        # Sostituisce i dati del nodo con quelli di uno snapshot.
+        self.engine.restore(src_path)
+        with self._change_lock:
+            # Il log locale non descrive più i dati: chi segue questo nodo deve ripartire da uno snapshot.
+            self.change_log.clear()
+            self._change_floor = self.change_seq
+
+    def bootstrap_from(self, peer, snapshot_path, key_lock=None):
+        # Inizializza il nodo da uno snapshot del peer e lo allinea con le modifiche avvenute nel frattempo.
+        # Restituisce False se il log del peer non copre più lo snapshot (serve una sincronizzazione completa).
+        key_lock = key_lock or (lambda key: nullcontext())
+        seq = peer.snapshot(snapshot_path)
+        try:
+            self.restore(snapshot_path)
+        finally:
+            for path in snapshot_files(snapshot_path):
+                os.remove(path)
+        changes = peer.changes_since(seq)
+        if changes is None:
+            return False
+        for _, op, key, value, version, expires_at in changes:
+            # Le modifiche sono idempotenti: le scritture vincono solo se più recenti e le cancellazioni
+            # non rimuovono valori scritti dopo di esse.
+            with key_lock(key):
+                self.apply_change(op, key, value, version, expires_at)
+        print(f"Node {self.node_id} bootstrapped from node {peer.node_id} snapshot (+{len(changes)} changes)")
+        return True
+
+    def close(self):
+        # Chiude lo storage del nodo, se è stato aperto.
+        if self.engine is not None:
+            self.engine.close()
 
 class ReplicationManager:
-    def __init__(self, nodes_db=3, port=5000, strategy='full', replication_factor=None):
+    def __init__(self, nodes_db=3, port=5000, strategy='full', replication_factor=None, storage_engine='sqlite',
+                 db_dir='db', read_policy='power_of_two', read_quorum=1, recovery_mode='sync', node_limits=None,
+                 partitions=1, write_quorum=1, replication_log=None, startup='parallel', startup_workers=None):
         # Inizializza il gestore della replica con un fattore di replica specificato.
         self.nodes_db = nodes_db
         # Inizializza la strategia di replica a 'full' per impostazione predefinita.
         self.strategy = strategy
-        # Crea un elenco di nodi replica con identificatori unici e porte.
-        self.nodes = [ReplicaNode(i, port + i) for i in range(self.nodes_db)]
+        # Crea un elenco di nodi replica con identificatori unici, porte e il motore di storage scelto.
+        # node_limits configura la coda di lavoro di ogni nodo (max_concurrent, max_queue, queue_timeout).
+        # Gli storage vengono aperti alla fine del costruttore, in parallelo (vedi _start_nodes).
+        self.nodes = [ReplicaNode(i, port + i, storage_engine, db_dir, limits=node_limits, partitions=partitions,
+                                  lazy=True)
+                      for i in range(self.nodes_db)]
+        # Politica con cui le letture vengono distribuite tra le repliche di una chiave.
+        self.read_policy = read_policy
+        self.read_router = create_router(read_policy)
+        # Numero di repliche consultate in parallelo per ogni lettura (R).
+        self.read_quorum = read_quorum
+        self.read_executor = ThreadPoolExecutor(max_workers=max(self.nodes_db, 1), thread_name_prefix='quorum-read')
+        # Le riparazioni delle repliche obsolete avvengono fuori dal percorso della richiesta.
+        self.repair_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='read-repair')
+        self.read_repairs = 0  # Numero di repliche riparate dall'avvio.
+        # Lock per chiave (a stripe) per le operazioni sui dati e lock lettori-scrittore per i cambi di topologia.
+        # Ordine di acquisizione: prima topology_lock, poi key_locks.
+        self.key_locks = StripedLock()
+        self.topology_lock = ReadWriteLock()
+        # Failure detector automatico, avviato su richiesta con start_failure_detector().
+        self.failure_detector = None
+        # Reaper delle chiavi scadute, avviato su richiesta con start_expiry_reaper().
+        self.expiry_reaper = None
+        # Recupero dei nodi: 'sync' copia riga per riga, 'snapshot' parte da uno snapshot di un peer.
+        self.recovery_mode = recovery_mode
+        self.snapshot_dir = os.path.join(db_dir, 'snapshots')  # Directory degli snapshot dei nodi.
+        # Strategia 'async': la scrittura è confermata dopo il commit sui primi W nodi (a partire dal primario)
+        # e il log di replica la invia in background agli altri nodi.
+        self.write_quorum = write_quorum
+        self.replication_log_options = replication_log or {}  # Opzioni del ReplicationLog.
+        self.replication_log = None
         # Inizializza la strategia di replica in base alla strategia specificata.
         self.consistent_hash = None
 
         if strategy == 'consistent':
             self.consistent_hash = ConsistentHash(self.nodes, replicas=replication_factor)
+        elif strategy == 'async':
+            self._enable_async()
+
+        # Avvio dei nodi: 'parallel' attende che tutti siano pronti, 'background' restituisce subito e
+        # le richieste vengono servite dai nodi già pronti mentre gli altri finiscono di avviarsi.
+        self.startup = startup
+        self._startup_cond = threading.Condition()
+        self.startup_executor = ThreadPoolExecutor(max_workers=startup_workers or min(max(self.nodes_db, 1), 32),
+                                                   thread_name_prefix='node-startup')
+        self._start_nodes()
+
+    def _start_nodes(self):
+        start_time = time.perf_counter()
+        self._starting = len(self.nodes)  # Avvii non ancora terminati (con successo o con errore).
+        futures = [self.startup_executor.submit(self._start_node, node) for node in self.nodes]
+        if self.startup == 'parallel':
+            for future in futures:
+                future.result()  # Propaga l'eventuale errore di apertura di uno storage.
+            print(f"{len(self.nodes)} nodes started in {time.perf_counter() - start_time:.3f} s")
+
+    def _start_node(self, node):
+        # Apre lo storage del nodo e lo rende pronto, allineandolo con le modifiche ricevute dai nodi già
+        # pronti durante il suo avvio (dai loro log delle modifiche, che partono dall'avvio del processo).
+        try:
+            node.open()
+            with self.topology_lock.write_lock():
+                # Il lock di scrittura serve solo ad attendere le operazioni in corso: da qui in poi tutte le
+                # scritture includono il nodo, e quelle precedenti sono già nei log dei peer.
+                node.ready.set()
+            # Come nel recupero di un nodo, la riapplicazione avviene sotto il lock di lettura bloccando una
+            # chiave alla volta, quindi i nodi pronti continuano a servire le richieste.
+            with self.topology_lock.read_lock():
+                # Un nodo fallito durante l'avvio viene sincronizzato al recupero.
+                if node.alive and not self._catch_up(node):
+                    # Il log di qualche peer non copre più l'intero avvio: serve una sincronizzazione completa.
+                    self._sync_started_node(node)
+        except Exception as e:
+            print(f"Node {node.node_id} failed to start: {e}")
+            raise
+        finally:
+            with self._startup_cond:
+                self._starting -= 1
+                self._startup_cond.notify_all()
+
+    def _catch_up(self, node):
+        # Riapplica al nodo le modifiche registrate dai peer pronti; restituisce False se un log è incompleto.
+        # Le modifiche vengono applicate con write_if_newer sotto il lock della chiave: una scrittura concorrente,
+        # già inviata anche a questo nodo, non viene sovrascritta da una modifica più vecchia.
+        changes = []
+        for peer in self.nodes:
+            if peer is node or not peer.is_alive():
+                continue
+            log = peer.changes_since(0)
+            if log is None:
+                return False
+            changes.extend(change[1:] for change in log if change[1] != 'purge' and self._stores(node, change[2]))
+        for change in changes:
+            with self.key_locks.lock(change[1]):
+                node.apply_change(*change)
+        if changes:
+            print(f"Node {node.node_id} caught up with {len(changes)} changes made during startup")
+        return True
+
+    def _stores(self, node, key):
+        # Indica se il nodo deve contenere il record: con la strategia 'consistent' solo le chiavi dell'anello.
+        if self.strategy != 'consistent':
+            return True
+        return node in self.consistent_hash.get_nodes_for_key(placement_key(key))
+
+    def _sync_started_node(self, node):
+        if self.strategy != 'consistent':
+            node.sync_with_active_nodes(self.nodes, key_lock=self.key_locks.lock)
+            return
+        for peer in self.nodes:
+            if peer is node or not peer.is_alive():
+                continue
+            for key, value, version, expires_at in peer.get_all_records():
+                if self._stores(node, key):
+                    with self.key_locks.lock(key):
+                        node.write_if_newer(key, value, version, expires_at)
+
+    def ready_nodes(self):
+        # Restituisce il numero di nodi con lo storage pronto.
+        return sum(1 for node in self.nodes if node.ready.is_set())
+
+    def wait_ready(self, count=None, timeout=None):
+        # Attende che almeno `count` nodi (default tutti) siano pronti; restituisce False allo scadere del timeout
+        # o se gli avvii sono terminati senza raggiungere `count` nodi pronti (errori di apertura).
+        # Un nodo è pronto appena riceve le scritture: attendendo tutti i nodi si attende anche il loro allineamento.
+        count = len(self.nodes) if count is None else min(count, len(self.nodes))
+        done = (lambda: not self._starting) if count == len(self.nodes) else (lambda: True)
+        with self._startup_cond:
+            self._startup_cond.wait_for(lambda: (self.ready_nodes() >= count and done()) or not self._starting,
+                                        timeout)
+            return self.ready_nodes() >= count and done()
 
     def set_replication_strategy(self, strategy, replication_factor=None):
-        self.strategy = strategy
+        with self.topology_lock.write_lock():
+            self.strategy = strategy
 
-        if strategy == 'consistent':
-            self.consistent_hash = ConsistentHash(self.nodes, replicas=replication_factor)
-            print(f"Setting replication strategy to {strategy} with replication factor {replication_factor}")
-        else:
-            self.consistent_hash = None
+            if strategy == 'consistent':
+                self.consistent_hash = ConsistentHash(self.nodes, replicas=replication_factor)
+                print(f"Setting replication strategy to {strategy} with replication factor {replication_factor}")
+            elif strategy == 'async':
+                self._enable_async()
+                print(f"Setting replication strategy to {strategy} with write quorum {self.write_quorum}")
+            else:
+                self.consistent_hash = None
 
-    def write_to_replicas(self, key, value):
-        # Scrive una coppia chiave-valore su tutti i nodi replica attivi.
+    def _enable_async(self):
+        # Nella strategia 'async' l'anello serve solo a scegliere il primario di ogni chiave:
+        # tutti i nodi restano repliche della chiave. Il log di replica resta attivo anche se la
+        # strategia cambia, così le modifiche già accodate vengono comunque consegnate.
+        self.consistent_hash = ConsistentHash(self.nodes)
+        if self.replication_log is None:
+            self.replication_log = ReplicationLog(self, **self.replication_log_options)
+            self.replication_log.start()
+
+    def write_to_replicas(self, key, value, ttl=None):
+        # Scrive una coppia chiave-valore su tutti i nodi replica attivi, con la stessa versione su ogni replica.
+        # Con ttl (secondi) la chiave scade nello stesso istante assoluto su tutte le repliche.
+        with self._data_lock(key):
+            self._write_to_replicas(key, value, ttl)
+
+    def write_if_absent(self, key, value, ttl=None):
+        # Scrive la chiave solo se non esiste in nessuna replica; restituisce False se esiste già.
+        # Controllo e scrittura avvengono sotto il lock della chiave, quindi due scritture concorrenti non si sovrappongono.
+        with self._data_lock(key):
+            with span('manager.exists_check'):
+                # Un valore caricato in streaming occupa la chiave come un valore normale.
+                exists = self._key_exists_in_replicas(key) or self._key_exists_in_replicas(manifest_key(key))
+            if exists:
+                return False
+            self._write_to_replicas(key, value, ttl)
+            return True
+
+    def _data_lock(self, key):
+        # Acquisisce il lock di topologia in lettura e il lock della chiave, misurando l'attesa nella trace.
+        stack = ExitStack()
+        with span('manager.lock_wait'):
+            stack.enter_context(self.topology_lock.read_lock())
+            stack.enter_context(self.key_locks.lock(key))
+        return stack
+
+    def _write_to_replicas(self, key, value, ttl=None):
+        version = time.time_ns()
+        expires_at = time.time() + ttl if ttl is not None else None
+        with span('manager.ring_lookup', strategy=self.strategy):
+            nodes = self._write_targets(key)
+        with self._work_slots(nodes), span('manager.write_replicas', replicas=len(nodes)):
+            for node in nodes:
+                print(f"Writing key '{key}' to node {node.node_id}")
+                node.write(key, value, version, expires_at)  # Scrive sul nodo.
+        self._replicate_async(key, ('write', key, value, version, expires_at))
+
+    def _write_targets(self, key):
+        # Restituisce i nodi attivi su cui va scritta la chiave.
         if self.strategy == 'full':
-            for node in self.nodes:
-                if node.is_alive():  # Verifica se il nodo è attivo
-                    print(f"Writing key '{key}' to node {node.node_id}")
-                    node.write(key, value)  # Scrive sul nodo.
-        # Se la strategia di replica è 'consistent', scrive sul nodo appropriato in base all'hash della chiave.
+            return [node for node in self.nodes if node.is_alive()]  # Solo i nodi attivi.
+        # Se la strategia di replica è 'consistent', scrive sui nodi appropriati in base all'hash della chiave.
         elif self.strategy == 'consistent':
-            nodes = self.consistent_hash.get_nodes_for_key(key)
+            return [node for node in self.consistent_hash.get_nodes_for_key(key) if node.is_alive()]
+        # Se la strategia di replica è 'async', scrive in modo sincrono solo sui primi W nodi attivi.
+        # Con meno di W nodi attivi la scrittura viene rifiutata invece di essere confermata con meno copie.
+        elif self.strategy == 'async':
+            nodes = self._async_replicas(key)[:self.write_quorum]
+            if len(nodes) < self.write_quorum:
+                raise QuorumUnavailable(f'Write quorum not reached for key {key}: '
+                                        f'{len(nodes)} alive replicas, {self.write_quorum} required')
+            return nodes
+        return []
+
+    def _async_replicas(self, key):
+        # Restituisce i nodi attivi a partire dal primario della chiave scelto dall'anello.
+        primary = self.consistent_hash.get_node(key)
+        return [node for node in [primary] + [node for node in self.nodes if node is not primary] if node.is_alive()]
+
+    def _replicate_async(self, key, change):
+        # Accoda la modifica per i follower della chiave (strategia 'async').
+        if self.strategy == 'async':
+            self.replication_log.append(self._async_replicas(key)[self.write_quorum:], change)
+
+    def compare_and_set(self, key, value, expected=ANY, expected_version=None, ttl=None):
+        # Scrive la chiave solo se il valore (expected, None = chiave assente) e/o la versione attuali coincidono.
+        # Restituisce un dizionario con l'esito, il valore e la versione risultanti.
+        with self._data_lock(key):
+            return self._compare_and_set(key, value, expected, expected_version, ttl)
+
+    def compare_and_set_many(self, operations):
+        # Esegue più compare-and-set (dizionari con gli argomenti di compare_and_set) tenendo i lock di tutte le chiavi.
+        with self.topology_lock.read_lock(), self.key_locks.lock_many([op['key'] for op in operations]):
+            return [self._compare_and_set(**op) for op in operations]
+
+    def increment(self, key, delta=1, ttl=None):
+        # Incrementa di delta il valore intero della chiave (0 se assente) e restituisce il nuovo valore.
+        with self._data_lock(key):
+            return self._increment(key, delta, ttl)
+
+    def increment_many(self, operations):
+        # Esegue più incrementi (dizionari con key, delta e ttl) tenendo i lock di tutte le chiavi.
+        # Un valore non intero fa fallire solo la propria operazione.
+        with self.topology_lock.read_lock(), self.key_locks.lock_many([op['key'] for op in operations]):
+            results = []
+            for op in operations:
+                try:
+                    results.append({'key': op['key'], 'value': self._increment(**op)})
+                except ValueError as e:
+                    results.append({'key': op['key'], 'error': str(e)})
+            return results
+
+    def _compare_and_set(self, key, value, expected=ANY, expected_version=None, ttl=None):
+        nodes = self._write_targets(key)
+        with self._work_slots(nodes):
+            current = self._newest_record(key, nodes)
+            if not self._matches(current, expected, expected_version):
+                return {'key': key, 'success': False, 'value': current[0] if current else None,
+                        'version': current[1] if current else None}
+            version = self._apply_update(key, value, current, ttl, nodes)
+            return {'key': key, 'success': True, 'value': value, 'version': version}
+
+    def _increment(self, key, delta=1, ttl=None):
+        nodes = self._write_targets(key)
+        with self._work_slots(nodes):
+            current = self._newest_record(key, nodes)
+            try:
+                value = int(current[0]) + delta if current else delta
+            except ValueError:
+                raise ValueError(f'The value of key {key} is not an integer')
+            self._apply_update(key, str(value), current, ttl, nodes)  # Salvato come testo, come fa SQLite.
+            return value
+
+    def _newest_record(self, key, nodes):
+        # Legge la chiave da tutte le repliche (già riservate dal chiamante) e restituisce il record più recente.
+        if not nodes:
+            raise RuntimeError(f'No alive replicas for key {key}')
+        records = [record for record in (node.engine.read_record(key) for node in nodes) if record is not None]
+        return max(records, key=lambda record: record[1]) if records else None
+
+    @staticmethod
+    def _matches(current, expected, expected_version):
+        # Confronta il record attuale con i valori attesi; i valori sono confrontati come testo perché
+        # i motori di storage non conservano tutti il tipo originale.
+        if expected is not ANY:
+            if current is None or expected is None:
+                if current is not None or expected is not None:
+                    return False
+            elif str(current[0]) != str(expected):
+                return False
+        if expected_version is not None and (current[1] if current else 0) != expected_version:
+            return False
+        return True
+
+    def _apply_update(self, key, value, current, ttl, nodes):
+        # Scrive il nuovo valore su tutte le repliche con una versione successiva a quella attuale.
+        # Senza ttl la scadenza attuale della chiave viene mantenuta.
+        version = max(time.time_ns(), current[1] + 1 if current else 0)
+        expires_at = time.time() + ttl if ttl is not None else (current[2] if current else None)
+        for node in nodes:
+            print(f"Writing key '{key}' to node {node.node_id}")
+            node.write_if_newer(key, value, version, expires_at)
+        self._replicate_async(key, ('write', key, value, version, expires_at))
+        return version
+
+    def _work_slots(self, nodes):
+        # Occupa un posto nella coda di lavoro di tutti i nodi prima di modificarli: se un nodo è saturo
+        # la richiesta viene rifiutata con Overloaded senza lasciare scritture parziali.
+        stack = ExitStack()
+        try:
             for node in nodes:
-                if node.is_alive():
-                    print(f"Writing key '{key}' to node {node.node_id}")
-                    node.write(key, value)
+                stack.enter_context(node.work_slot())
+        except Overloaded:
+            stack.close()
+            raise
+        return stack
 
-    def read_from_replicas(self, key):
-        # Legge il valore associato a una chiave dai nodi replica attivi.
-        if self.strategy == 'full':
-            for node in self.nodes:
-                if node.is_alive():  # Verifica se il nodo è attivo
-                    result = node.read(key)  # Legge il valore associato al nodo
-                    if result is not None:  # Se il risultato non è None, Restituisce il valore e un messaggio..
-                        return {'value': result, 'message': f'Read from replica {node.node_id}'}
-        # Se la strategia di replica è 'consistent', scrive sul nodo appropriato in base all'hash della chiave.
+    def set_read_policy(self, policy):
+        # Cambia la politica di instradamento delle letture.
+        self.read_router = create_router(policy)
+        self.read_policy = policy
+
+    def _read_candidates(self, key):
+        # Restituisce i nodi attivi che possiedono una replica della chiave.
+        # Con la strategia 'async' i follower possono essere in ritardo (consistenza eventuale).
+        if self.strategy in ('full', 'async'):
+            return [node for node in self.nodes if node.is_alive()]
         elif self.strategy == 'consistent':
-            node = self.consistent_hash.get_node(key)
-            if node and node.is_alive():
-                result = node.read(key)
-                if result is not None:
-                    return {'value': result, 'message': f'Read from replica {node.node_id}'}
+            return [node for node in self.consistent_hash.get_nodes_for_key(key) if node.is_alive()]
+        return []
+
+    def read_from_replicas(self, key):
+        # Legge il valore associato a una chiave dai nodi replica attivi, nell'ordine scelto dalla politica di lettura.
+        with self.topology_lock.read_lock(), span('manager.read'):
+            return self._read_from_replicas(key)
+
+    def _read_from_replicas(self, key):
+        # I nodi sospetti (lenti o in ritardo sugli heartbeat) vengono interrogati solo dopo quelli sani.
+        nodes = self._read_candidates(key)
+        candidates = (self.read_router.order([node for node in nodes if not node.suspect]) +
+                      self.read_router.order([node for node in nodes if node.suspect]))
+        if self.read_quorum > 1:
+            result = self._quorum_read(key, candidates[:self.read_quorum])
+            if result is not None:
+                return result
+        else:
+            overloaded = []
+            for node in candidates:
+                try:
+                    record = node.read_record(key)  # Legge il valore associato al nodo
+                except Overloaded as e:
+                    overloaded.append(e)  # Il nodo è saturo: prova la replica successiva.
+                    continue
+                if record is not None:  # Se il risultato non è None, Restituisce il valore e un messaggio..
+                    return self._read_result(record, f'Read from replica {node.node_id}')
+            if candidates and len(overloaded) == len(candidates):
+                raise overloaded[0]  # Tutte le repliche sono sature: la richiesta va rifiutata, non è un "not found".
+        # Con consistent hashing la chiave può essere ospitata temporaneamente da un nodo fuori dal suo insieme di
+        # repliche (anche con le letture in quorum, quando nessuna replica dell'anello ha la chiave).
+        if self.strategy == 'consistent' and key in self.consistent_hash.temp_key_storage:
+            node = self.nodes[self.consistent_hash.temp_key_storage[key][0]]
+            record = node.read_record(key) if node.is_alive() else None
+            if record is not None:
+                return self._read_result(record, f'Read from replica {node.node_id}')
         # Se nessun nodo ha restituito un valore, restituisce un messaggio di errore.
         return {'value': None, 'message': 'All replicas failed or key not found'}
 
+    def _quorum_read(self, key, nodes):
+        # Interroga in parallelo R repliche e restituisce il valore con la versione più recente
+        # (None se nessuna replica interrogata ha la chiave, nemmeno come tombstone).
+        # read_version restituisce anche i tombstone: una cancellazione più recente vince su una copia rimasta
+        # su una replica che non l'ha ricevuta (ad esempio perché era fallita).
+        futures = {self.read_executor.submit(bind_context(node.read_version), key): node for node in nodes}
+        wait(futures)
+        responses = []
+        overloaded = []
+        for future, node in futures.items():
+            try:
+                responses.append((node, future.result()))
+            except Overloaded as e:
+                overloaded.append(e)
+            except Exception as e:
+                print(f"Quorum read of key '{key}' failed on node {node.node_id}: {e}")
+        if overloaded and not responses:
+            raise overloaded[0]
+        records = [(node, record) for node, record in responses if record is not None]
+        if not records:
+            return None
+        newest_node, newest = max(records, key=lambda item: item[1][1])
+        # Le repliche senza la chiave o con una versione più vecchia vengono riparate in background.
+        stale = [node for node, record in responses if record is None or record[1] < newest[1]]
+        if stale:
+            self.repair_executor.submit(self._read_repair, key, newest, stale)
+        if newest[0] is None:
+            return {'value': None, 'message': f'Key {key} was deleted (replica {newest_node.node_id})'}
+        return self._read_result(
+            newest, f'Read from replica {newest_node.node_id} (quorum {len(responses)}/{self.read_quorum})')
+
+    def _read_result(self, record, message):
+        value, version, expires_at = record
+        return {'value': value, 'version': version, 'expires_at': expires_at, 'message': message}
+
+    def _read_repair(self, key, record, nodes):
+        # Aggiorna le repliche obsolete; write_if_newer evita di sovrascrivere scritture più recenti nel frattempo.
+        # Se il record più recente è un tombstone la cancellazione viene propagata alle repliche obsolete.
+        value, version, expires_at = record
+        for node in nodes:
+            if node.write_if_newer(key, value, version, expires_at):
+                self.read_repairs += 1
+                print(f"Read repair of key '{key}' on node {node.node_id}")
+
     def delete_from_replicas(self, key):
         # Elimina una chiave da tutti i nodi replica.
+        # Con la strategia 'async' la cancellazione passa dal log di replica per i follower, così non
+        # può essere superata da una scrittura più vecchia ancora in coda.
+        with self._data_lock(key):
+            self._delete_record(key, key)
+
+    def _delete_record(self, key, record_key):
+        # Elimina record_key (la chiave stessa o un record di un suo valore a chunk) dalle repliche di key.
+        # Come per le scritture, la versione della cancellazione è unica per tutte le repliche e per i follower.
+        version = time.time_ns()
+        nodes = self._write_targets(key) if self.strategy == 'async' else self.nodes
+        with self._work_slots([node for node in nodes if node.is_alive()]):
+            for node in nodes:
+                node.delete(record_key, version)  # Richiama il metodo di eliminazione su ciascun nodo.
+        self._replicate_async(key, ('delete', record_key, None, version, None))
+
+    def write_stream(self, key, chunks):
+        # Scrive un valore grande come sequenza di chunk (bytes) letti da un iterabile, uno alla volta:
+        # ogni chunk viene inviato a tutte le repliche prima di leggere il successivo, quindi la memoria
+        # usata è proporzionale alla dimensione di un chunk e non a quella del valore.
+        # Il manifest viene scritto per ultimo: fino ad allora le letture vedono il valore precedente.
+        # Solleva ValueError se la chiave contiene già un valore normale: i due tipi di valore non condividono
+        # una chiave (il controllo viene ripetuto sotto il lock della chiave prima del commit).
+        version = time.time_ns()
+        with self.topology_lock.read_lock():
+            nodes = self._write_targets(key)
+            plain = self._key_exists_in_replicas(key)
+        if not nodes:
+            raise RuntimeError(f'No alive replicas for key {key}')
+        if plain:
+            raise ValueError(f'The key {key} already holds a value written with /write')
+        count = size = 0
+        try:
+            for data in chunks:
+                record_key = chunk_key(key, version, count)
+                encoded = base64.b64encode(data).decode('ascii')  # Tutti i motori memorizzano testo.
+                with self.topology_lock.read_lock(), self._work_slots(nodes), span('manager.write_chunk', index=count):
+                    for node in nodes:
+                        node.write(record_key, encoded, version)
+                    # Ai follower viene accodato solo un riferimento: il log di replica rilegge il chunk all'invio.
+                    self._replicate_async(key, ('chunk', record_key, None, version, None))
+                count += 1
+                size += len(data)
+        except Exception:
+            # Scrittura interrotta (client disconnesso, nodo saturo): elimina i chunk già scritti.
+            with self.topology_lock.read_lock():
+                self._drop_chunks(key, version, count)
+            raise
+        with self._data_lock(key):
+            if self._key_exists_in_replicas(key):
+                self._drop_chunks(key, version, count)
+                raise ValueError(f'The key {key} already holds a value written with /write')
+            nodes = self._write_targets(key)
+            with self._work_slots(nodes):
+                previous = self._newest_record(manifest_key(key), nodes)
+                # La versione del manifest viene assegnata al commit, sotto il lock della chiave, e supera sempre
+                # quella del manifest sostituito: con due caricamenti sovrapposti vince quello confermato per
+                # ultimo. La versione presa all'inizio resta solo lo spazio dei nomi dei chunk.
+                manifest = {'version': max(time.time_ns(), previous[1] + 1 if previous else 0),
+                            'chunks_version': version, 'chunks': count, 'size': size}
+                for node in nodes:
+                    node.write(manifest_key(key), json.dumps(manifest), manifest['version'])
+            self._replicate_async(key, ('write', manifest_key(key), json.dumps(manifest), manifest['version'], None))
+            if previous is not None:
+                # I chunk della versione sostituita non sono più raggiungibili.
+                previous = json.loads(previous[0])
+                self._drop_chunks(key, previous['chunks_version'], previous['chunks'])
+        return manifest
+
+    def _drop_chunks(self, key, version, count):
+        # Rimuove senza tombstone i primi `count` chunk della versione `version` del valore della chiave, dalle
+        # repliche attive e (strategia 'async') dai follower tramite il log di replica. È una pulizia: gli errori
+        # vengono solo registrati, così non sostituiscono l'esito (o l'errore) del caricamento.
+        nodes = self._async_replicas(key)[:self.write_quorum] if self.strategy == 'async' else self.nodes
+        for index in range(count):
+            record_key = chunk_key(key, version, index)
+            for node in nodes:
+                try:
+                    node.drop(record_key)
+                except Exception as e:
+                    print(f"Failed to drop chunk '{record_key}' on node {node.node_id}: {e}")
+            self._replicate_async(key, ('drop', record_key, None, None, None))
+
+    def resolve_change(self, change):
+        # Sostituisce un riferimento a un chunk accodato per i follower con la scrittura corrispondente, letta
+        # da una replica che lo possiede; restituisce None se il chunk è stato nel frattempo eliminato.
+        op, key, _, version, _ = change
+        if op != 'chunk':
+            return change
         for node in self.nodes:
-            node.delete(key)  # Richiama il metodo di eliminazione su ciascun nodo.
+            record = node.engine.read_record(key) if node.is_alive() else None
+            if record is not None and record[1] == version:
+                return 'write', key, record[0], version, record[2]
+        return None
+
+    def read_stream_manifest(self, key):
+        # Restituisce il manifest più recente del valore a chunk della chiave, oppure None.
+        with self.topology_lock.read_lock():
+            records = [record for record in (node.read_record(manifest_key(key))
+                                             for node in self._read_candidates(key)) if record is not None]
+        return json.loads(max(records, key=lambda record: record[1])[0]) if records else None
+
+    def read_chunk(self, key, version, index):
+        # Legge un chunk dalla prima replica che lo possiede; solleva KeyError se non esiste più
+        # (il valore è stato sovrascritto o eliminato durante la lettura).
+        with self.topology_lock.read_lock():
+            for node in self.read_router.order(self._read_candidates(key)):
+                record = node.read_record(chunk_key(key, version, index))
+                if record is not None:
+                    return base64.b64decode(record[0])
+        raise KeyError(f'Chunk {index} of key {key} is no longer available')
+
+    def iter_stream(self, key, manifest):
+        # Restituisce i chunk del valore descritto dal manifest, uno alla volta.
+        for index in range(manifest['chunks']):
+            yield self.read_chunk(key, manifest['chunks_version'], index)
+
+    def delete_stream(self, key):
+        # Elimina il valore a chunk della chiave; restituisce False se non esiste.
+        with self._data_lock(key):
+            nodes = self._write_targets(key)
+            with self._work_slots(nodes):
+                manifest = self._newest_record(manifest_key(key), nodes)
+            if manifest is None:
+                return False
+            manifest = json.loads(manifest[0])
+            self._delete_record(key, manifest_key(key))
+            self._drop_chunks(key, manifest['chunks_version'], manifest['chunks'])
+            return True
 
     def key_exists_in_replicas(self, key):
         # Verifica se una chiave esiste in almeno uno dei nodi replica attivi.
+        with self.topology_lock.read_lock():
+            return self._key_exists_in_replicas(key)
+
+    def _key_exists_in_replicas(self, key):
         for node in self.nodes:
             if node.is_alive() and node.key_exists(key):  # Verifica se la chiave esiste nel nodo attivo.
                 return True  # Ritorna True se la jey esiste.
@@ -190,31 +940,150 @@ class ReplicationManager:
         # Simula il fallimento di un nodo specifico identificato da node_id.
         if 0 <= node_id < len(self.nodes):  # Fa un check per vedere se l'ID esiste.
             node = self.nodes[node_id]
-            node.fail()
-            if self.strategy == 'consistent':
-                self.consistent_hash.redistribute_keys(node)
+            # Il cambio di stato esclude le operazioni sui dati solo per il tempo del flag.
+            with self.topology_lock.write_lock():
+                node.fail()
+                consistent_hash = self.consistent_hash if self.strategy == 'consistent' else None
+            # Lo spostamento delle chiavi blocca solo le chiavi spostate, una alla volta.
+            if consistent_hash:
+                with self.topology_lock.read_lock():
+                    consistent_hash.redistribute_keys(node, key_lock=self.key_locks.lock)
 
     def recover_node(self, node_id):
         """Recupera un nodo e ripristina le sue chiavi, eliminando le chiavi dal nodo ospitante."""
         if 0 <= node_id < len(self.nodes):
             node = self.nodes[node_id]
-            node.recover(self.nodes, self.strategy)  # Recupera lo stato del nodo
-            if self.strategy == 'consistent':
-                print(f"Recovering node {node_id}...")
-                self.consistent_hash.recover_node(node)  # Recupera le chiavi nel nodo consistent hash
+            with self.topology_lock.write_lock():
+                if not node.ready.is_set():
+                    node.resume()  # Ancora in avvio: verrà allineato quando lo storage è pronto.
+                    return
+                was_failed = not node.is_alive()
+                node.resume()  # Da qui in poi le nuove scritture includono il nodo.
+                strategy = self.strategy
+                consistent_hash = self.consistent_hash
+                if self.replication_log is not None and was_failed:
+                    self.replication_log.reset(node_id)  # La sincronizzazione completa sostituisce la coda.
+            with self.topology_lock.read_lock():
+                if strategy in ('full', 'async') and was_failed:
+                    if not (self.recovery_mode == 'snapshot' and self._bootstrap(node)):
+                        node.sync_with_active_nodes(self.nodes, key_lock=self.key_locks.lock)  # Sincronizza i dati
+                elif strategy == 'consistent':
+                    print(f"Recovering node {node_id}...")
+                    consistent_hash.recover_node(node, key_lock=self.key_locks.lock)  # Recupera le chiavi nel nodo
+
+    def _get_node(self, node_id):
+        # Restituisce il nodo con l'ID indicato, sollevando ValueError se non esiste.
+        if not 0 <= node_id < len(self.nodes):
+            raise ValueError(f'Node {node_id} does not exist')
+        return self.nodes[node_id]
+
+    def _ready_node(self, node_id):
+        # Come _get_node, ma solleva RuntimeError se lo storage del nodo non è ancora stato aperto.
+        node = self._get_node(node_id)
+        if not node.ready.is_set():
+            raise RuntimeError(f'Node {node_id} is still starting')
+        return node
+
+    def _bootstrap(self, node, source_id=None):
+        # Inizializza il nodo da uno snapshot di un peer attivo (preferendo i peer non sospetti).
+        if source_id is not None:
+            peers = [self._get_node(source_id)]
+        else:
+            peers = sorted((peer for peer in self.nodes if peer.is_alive() and peer is not node),
+                           key=lambda peer: peer.suspect)
+        if not peers or not peers[0].is_alive() or peers[0] is node:
+            return False
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        snapshot_path = os.path.join(self.snapshot_dir, f'bootstrap_{node.node_id}_{time.time_ns()}.db')
+        return node.bootstrap_from(peers[0], snapshot_path, key_lock=self.key_locks.lock)
+
+    def snapshot_node(self, node_id):
+        # Crea uno snapshot online del nodo nella directory degli snapshot.
+        node = self._ready_node(node_id)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        name = f'replica_{node_id}_{time.time_ns()}.db'
+        seq = node.snapshot(os.path.join(self.snapshot_dir, name))
+        return {'node_id': node_id, 'snapshot': name, 'seq': seq}
+
+    def restore_node(self, node_id, name):
+        # Ripristina il nodo da uno snapshot presente nella directory degli snapshot.
+        node = self._ready_node(node_id)
+        path = os.path.join(self.snapshot_dir, os.path.basename(name))  # Solo file della directory degli snapshot.
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'Snapshot {name} not found')
+        with self.topology_lock.read_lock():
+            node.restore(path)
+
+    def bootstrap_node(self, node_id, source_id=None):
+        # Riattiva il nodo e lo inizializza da uno snapshot di un peer, con fallback alla sincronizzazione completa.
+        # Come in recover_node, solo con le strategie in cui ogni nodo ha tutte le chiavi: con 'consistent' lo
+        # snapshot di un peer sostituirebbe le chiavi del nodo con quelle, diverse, del peer.
+        node = self._ready_node(node_id)
+        if self.strategy == 'consistent':
+            raise RuntimeError('Snapshot bootstrap is not available with the consistent strategy: use /recover')
+        with self.topology_lock.write_lock():
+            node.resume()
+        with self.topology_lock.read_lock():
+            if self._bootstrap(node, source_id):
+                return 'snapshot'
+            node.sync_with_active_nodes(self.nodes, key_lock=self.key_locks.lock)
+            return 'sync'
+
+    def start_failure_detector(self, **options):
+        # Avvia il rilevamento automatico dei guasti tramite heartbeat (vedi FailureDetector per le opzioni).
+        if self.failure_detector is None:
+            self.failure_detector = FailureDetector(self, **options)
+            self.failure_detector.start()
+        return self.failure_detector
+
+    def start_expiry_reaper(self, **options):
+        # Avvia l'eliminazione in background delle chiavi scadute (vedi ExpiryReaper per le opzioni).
+        if self.expiry_reaper is None:
+            self.expiry_reaper = ExpiryReaper(self, **options)
+            self.expiry_reaper.start()
+        return self.expiry_reaper
 
     def get_nodes_status(self):
         # Restituisce lo stato di tutti i nodi in un elenco di dizionari.
         return [
             {
                 'node_id': node.node_id,  # ID del nodo
-                'status': 'alive' if node.is_alive() else 'dead',  # Stato del nodo (attivo o non ).
-                'port': node.port  # Porta del nodo.
+                # Stato del nodo: attivo, non attivo o con lo storage ancora in apertura.
+                'status': 'alive' if node.is_alive() else 'starting' if node.alive else 'dead',
+                'ready': node.ready.is_set(),  # Storage aperto: il nodo riceve le scritture.
+                # Tempo impiegato ad aprire lo storage del nodo.
+                'startup_ms': round(node.startup_time * 1000, 3) if node.startup_time is not None else None,
+                'port': node.port,  # Porta del nodo.
+                'storage_engine': node.storage_engine,  # Motore di storage del nodo.
+                'partitions': node.partitions,  # Partizioni dello storage del nodo.
+                'in_flight': node.in_flight,  # Letture in corso sul nodo.
+                'reads': node.reads,  # Letture servite dal nodo.
+                'latency_ewma_ms': round(node.latency_ewma * 1000, 3),  # Latenza media di lettura.
+                # Richieste in esecuzione e in coda sul nodo, se la coda di lavoro è limitata.
+                **({'queue': node.work_queue.get_status()} if node.work_queue else {}),
+                # Ritardo di replica del nodo come follower (strategia 'async').
+                **({'replication': self.replication_log.get_status(node.node_id)} if self.replication_log else {}),
+                # Stato rilevato dal failure detector (health, phi, latenza degli heartbeat), se attivo.
+                **(self.failure_detector.get_status(node.node_id) if self.failure_detector else {})
             }
             for node in self.nodes
         ]
 
 
+    def close(self):
+        # Ferma il failure detector, attende le riparazioni in corso e chiude lo storage di tutti i nodi.
+        self.startup_executor.shutdown()  # Attende gli avvii dei nodi ancora in corso.
+        if self.failure_detector is not None:
+            self.failure_detector.stop()
+        if self.expiry_reaper is not None:
+            self.expiry_reaper.stop()
+        if self.replication_log is not None:
+            self.replication_log.stop()
+        self.read_executor.shutdown()
+        self.repair_executor.shutdown()
+        for node in self.nodes:
+            node.close()
+
     def get_nodes_for_key(self, key):
         # Returns the nodes responsible for the key based on the replication strategy.
         if self.strategy == 'consistent' and self.consistent_hash:
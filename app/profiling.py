@@ -0,0 +1,120 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Con sys.monitoring (Python 3.12+) un solo cProfile.Profile può essere attivo, per tutti i thread del processo.
+PROCESS_WIDE = sys.version_info >= (3, 12)
+
+
+class Profiler:
+    """Profiling su richiesta del server in esecuzione, limitato nel tempo.
+
+    Due modalità:
+      - 'cprofile': per `seconds` secondi le richieste API vengono profilate con
+        cProfile e le statistiche finiscono in un unico report. Da Python 3.12
+        cProfile usa sys.monitoring, che ammette un solo profiler attivo per
+        processo e vede tutti i thread: la sessione abilita quindi un unico
+        profiler in run(). Nelle versioni precedenti un profiler vede solo il
+        thread che lo abilita, quindi ogni richiesta ha il proprio profiler e
+        le statistiche vengono sommate;
+      - 'sampling': campiona ogni `interval` secondi gli stack di tutti i thread
+        con sys._current_frames() e restituisce gli stack aggregati nel formato
+        "collapsed" (una riga per stack, compatibile con i flame graph).
+    Può essere attiva una sola sessione alla volta.
+    """
+
+    MODES = ('cprofile', 'sampling')
+
+    def __init__(self, max_seconds=60):
+        self.max_seconds = max_seconds  # Durata massima di una sessione.
+        self._session_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._deadline = 0.0  # Fine della sessione cProfile in corso (time.monotonic).
+        self._stats = None
+
+    @contextmanager
+    def request(self):
+        """Esegue il blocco sotto cProfile se è in corso una sessione 'cprofile' con profiler per thread."""
+        if PROCESS_WIDE or time.monotonic() >= self._deadline:
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._stats_lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def run(self, mode, seconds, interval=0.005):
+        """Esegue una sessione e restituisce il report testuale; solleva RuntimeError se un'altra è in corso."""
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}'")
+        seconds = min(max(seconds, 0.0), self.max_seconds)
+        if not self._session_lock.acquire(blocking=False):
+            raise RuntimeError('A profiling session is already running')
+        try:
+            if mode == 'cprofile':
+                return self._run_cprofile(seconds)
+            return self._run_sampling(seconds, interval)
+        finally:
+            self._session_lock.release()
+
+    def _run_cprofile(self, seconds):
+        if PROCESS_WIDE:
+            stats = self._profile_process(seconds)
+        else:
+            self._stats = None
+            self._deadline = time.monotonic() + seconds
+            time.sleep(seconds)
+            self._deadline = 0.0
+            with self._stats_lock:
+                stats, self._stats = self._stats, None
+        if stats is None:
+            return 'No requests were handled during the profiling session.\n'
+        stats.stream = io.StringIO()
+        stats.sort_stats('cumulative').print_stats(100)
+        return stats.stream.getvalue()
+
+    def _profile_process(self, seconds):
+        # Un unico profiler per l'intera sessione, abilitato e disabilitato da questo thread.
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            raise RuntimeError(f'Another profiler is already active: {e}')
+        try:
+            time.sleep(seconds)
+        finally:
+            profile.disable()
+        try:
+            return pstats.Stats(profile)
+        except TypeError:
+            return None  # Nessuna funzione registrata durante la sessione.
+
+    def _run_sampling(self, seconds, interval):
+        counts = Counter()
+        own_thread = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue  # Il thread che campiona non è interessante.
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                counts[';'.join(reversed(stack))] += 1
+            time.sleep(interval)
+        return ''.join(f'{stack} {count}\n' for stack, count in counts.most_common())
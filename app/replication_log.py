@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque
+
+
+class ReplicationLog:
+    """Log di replica per follower usato dalla strategia 'async'.
+
+    Le scritture vengono confermate dopo il commit sui primi W nodi; per ogni
+    altro nodo (follower) le modifiche vengono accodate qui e un thread in
+    background le invia a batch. Ogni coda è FIFO, quindi un follower applica
+    le modifiche di una chiave nello stesso ordine del primario. Se la coda di
+    un follower supera `max_pending` viene svuotata e il follower viene
+    risincronizzato completamente.
+    """
+
+    def __init__(self, manager, batch_size=100, interval=0.05, max_pending=100000, clock=time.monotonic):
+        self.manager = manager
+        self.batch_size = batch_size  # Modifiche al massimo per batch e per follower.
+        self.interval = interval  # Attesa massima del thread di invio quando non ci sono modifiche (secondi).
+        self.max_pending = max_pending  # Modifiche al massimo in coda per follower.
+        self.clock = clock
+        self.queues = {node.node_id: deque() for node in manager.nodes}  # node_id -> (accodata_il, modifica)
+        self.shipped = 0  # Modifiche inviate dall'avvio.
+        self.resyncs = 0  # Risincronizzazioni complete dovute a code piene.
+        self._resync = set()  # Follower la cui coda è stata scartata.
+        self._shipping = 0  # Batch estratti dalle code ma non ancora applicati.
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Avvia l'invio delle modifiche in un thread in background."""
+        self._thread = threading.Thread(target=self._run, daemon=True, name='replication-log')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def append(self, nodes, change):
+        """Accoda la modifica (op, chiave, valore, versione, scadenza) per i follower indicati."""
+        if not nodes:
+            return
+        now = self.clock()
+        with self._cond:
+            for node in nodes:
+                queue = self.queues[node.node_id]
+                if len(queue) >= self.max_pending:
+                    queue.clear()  # Il follower è troppo indietro: verrà risincronizzato per intero.
+                    self._resync.add(node.node_id)
+                queue.append((now, change))
+            self._cond.notify_all()
+
+    def reset(self, node_id):
+        """Scarta le modifiche in coda per un nodo che sta per essere sincronizzato per intero."""
+        with self._cond:
+            self.queues[node_id].clear()
+            self._resync.discard(node_id)
+            self._cond.notify_all()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                shipped = self.ship()
+            except Exception as e:
+                print(f"Replication log error: {e}")
+                shipped = 0
+            if not shipped:
+                with self._cond:
+                    self._cond.wait(self.interval)  # Risvegliato da append() appena arrivano modifiche.
+
+    def ship(self):
+        """Invia un batch a ogni follower attivo e restituisce il numero di modifiche inviate."""
+        shipped = 0
+        for node in self.manager.nodes:
+            if not node.is_alive():
+                continue  # Le modifiche restano in coda; al recupero il nodo viene comunque sincronizzato.
+            if node.node_id in self._resync:
+                self._resync_node(node)
+            with self._cond:
+                queue = self.queues[node.node_id]
+                entries = [queue.popleft() for _ in range(min(len(queue), self.batch_size))]
+                if not entries:
+                    continue
+                self._shipping += 1
+            batch = [change for _, change in entries]
+            try:
+                # I chunk sono accodati come riferimenti e vengono letti dallo storage solo al momento dell'invio.
+                batch = [change for change in map(self.manager.resolve_change, batch) if change is not None]
+                self._apply(node, batch)
+            except Exception:
+                with self._cond:
+                    queue.extendleft(reversed(entries))  # Riprova al giro successivo.
+                raise
+            finally:
+                with self._cond:
+                    self._shipping -= 1
+                    self._cond.notify_all()
+            shipped += len(batch)
+        self.shipped += shipped
+        return shipped
+
+    def _apply(self, node, batch):
+        # Le modifiche del follower sono condizionate alla versione, quindi le scritture vengono applicate in
+        # un unico batch senza bloccare le chiavi: le scritture dei client non attendono l'invio. Solo le
+        # cancellazioni prendono il lock della propria chiave, una alla volta, come le cancellazioni sincrone.
+        node.apply_changes([change for change in batch if change[0] != 'delete'])
+        for change in batch:
+            if change[0] == 'delete':
+                with self.manager.key_locks.lock(change[1]):
+                    node.apply_changes([change])
+
+    def _resync_node(self, node):
+        print(f"Replication log: node {node.node_id} fell too far behind, resyncing it")
+        with self._cond:
+            self._resync.discard(node.node_id)
+        with self.manager.topology_lock.read_lock():
+            node.sync_with_active_nodes(self.manager.nodes, key_lock=self.manager.key_locks.lock)
+        self.resyncs += 1
+
+    def flush(self, timeout=5.0):
+        """Attende che le code dei follower attivi siano vuote; restituisce False allo scadere del timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._shipping or any(self.queues[node.node_id] for node in self.manager.nodes if node.is_alive()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def get_status(self, node_id):
+        """Restituisce il ritardo di replica di un follower: modifiche in coda ed età della più vecchia."""
+        with self._cond:
+            queue = self.queues[node_id]
+            lag = self.clock() - queue[0][0] if queue else 0.0
+            return {'pending': len(queue), 'lag_ms': round(lag * 1000, 3)}
@@ -1,6 +1,9 @@
-from flask import request, jsonify
+from flask import g, request, jsonify, Response
 from functools import wraps
-from .models import ReplicationManager
+from .admission import AdmissionController, Overloaded
+from .models import ANY, CHUNK_PREFIX, ReplicationManager
+from .profiling import Profiler
+from .tracing import Tracer, span
 import json
 import os
 
@@ -8,16 +11,94 @@ import os
 nodes_db = 3
 port = 5000
 API_TOKEN = "your_api_token_here"
+admission_controller = None  # Controllo di ammissione (concorrenza e rate limit), se configurato.
+tracer = Tracer()  # Trace delle richieste e log delle richieste lente.
+profiler = Profiler()  # Profiling su richiesta del server in esecuzione.
+stream_chunk_size = 256 * 1024  # Dimensione predefinita (byte) dei chunk dei valori in streaming.
 
-# Decorator per richiedere un token API valido.
+# Risposta 429 (503 se mancano repliche) per le richieste rifiutate per sovraccarico.
+def overloaded_response(e):
+    return jsonify({'error': e.error, 'message': str(e)}), e.status, {'Retry-After': e.retry_after_header}
+
+# Verifica che un ttl opzionale sia un numero positivo di secondi.
+def invalid_ttl(ttl):
+    return ttl is not None and (isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl <= 0)
+
+# Verifica se una chiave usa il prefisso riservato ai record dei valori in streaming.
+def reserved_key(key):
+    return isinstance(key, str) and key.startswith(CHUNK_PREFIX)
+
+RESERVED_KEY_MESSAGE = f"Keys starting with '{CHUNK_PREFIX}' are reserved"
+
+# Verifica che un valore sia un intero (esclusi i booleani).
+def is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+# Estrae e valida gli argomenti di un compare-and-set; restituisce (argomenti, errore).
+def parse_cas(data):
+    if not isinstance(data, dict) or 'key' not in data or 'value' not in data:
+        return None, 'Key and value are required'
+    if reserved_key(data['key']):
+        return None, RESERVED_KEY_MESSAGE
+    if 'expected' not in data and 'expected_version' not in data:
+        return None, 'Expected value or expected version is required'
+    if data.get('expected_version') is not None and not is_integer(data['expected_version']):
+        return None, 'Expected version must be an integer'
+    if invalid_ttl(data.get('ttl')):
+        return None, 'TTL must be a positive number of seconds'
+    return {'key': data['key'], 'value': data['value'], 'expected': data.get('expected', ANY),
+            'expected_version': data.get('expected_version'), 'ttl': data.get('ttl')}, None
+
+# Estrae e valida gli argomenti di un incremento; restituisce (argomenti, errore).
+def parse_incr(data):
+    if not isinstance(data, dict) or 'key' not in data:
+        return None, 'Key is required'
+    if reserved_key(data['key']):
+        return None, RESERVED_KEY_MESSAGE
+    if not is_integer(data.get('delta', 1)):
+        return None, 'Delta must be an integer'
+    if invalid_ttl(data.get('ttl')):
+        return None, 'TTL must be a positive number of seconds'
+    return {'key': data['key'], 'delta': data.get('delta', 1), 'ttl': data.get('ttl')}, None
+
+# Decorator per richiedere un token API valido e applicare il controllo di ammissione.
 def require_api_token(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if request.headers.get('Authorization') != f"Bearer {API_TOKEN}":
+        token = request.headers.get('Authorization')
+        if token != f"Bearer {API_TOKEN}":
             return jsonify({'error': 'Unauthorized', 'message': 'Invalid API token'}), 403
-        return f(*args, **kwargs)
+        if admission_controller is None:
+            return traced_call(f, *args, **kwargs)
+        try:
+            admission_controller.admit(token)
+        except Overloaded as e:
+            return overloaded_response(e)
+        try:
+            response = traced_call(f, *args, **kwargs)
+        except BaseException:
+            admission_controller.release()
+            raise
+        if isinstance(response, Response) and response.is_streamed:
+            # Una risposta in streaming (GET /stream) viene generata dopo il ritorno della route:
+            # il posto resta occupato finché l'invio non è terminato.
+            response.call_on_close(admission_controller.release)
+        else:
+            admission_controller.release()
+        return response
     return decorated_function
 
+# Esegue la route dentro una trace con l'ID della richiesta (header X-Request-ID o generato).
+def traced_call(f, *args, **kwargs):
+    with tracer.trace(f'{request.method} {request.path}', request.headers.get('X-Request-ID')) as trace:
+        g.request_id = trace.request_id
+        with profiler.request():
+            if request.is_json:
+                with span('request.json'):
+                    request.get_json(silent=True)  # Il corpo decodificato resta in cache per la route.
+            with span(f'route.{f.__name__}'):
+                return f(*args, **kwargs)
+
 # Funzione per registrare le routes con l'app Flask
 def register_routes(app, config):
 
@@ -25,13 +106,51 @@ def register_routes(app, config):
     global nodes_db
     global port
     global API_TOKEN
+    global admission_controller
+    global tracer
+    global stream_chunk_size
 
     nodes_db = config.get('nodes_db')
     port = config.get('port')
     API_TOKEN = config.get('API_TOKEN')
 
-    # Inizializza il gestore della replica con il fattore di replica dal file.
-    replication_manager = ReplicationManager(nodes_db=nodes_db, port=port)
+    # Inizializza il gestore della replica con il fattore di replica e il motore di storage dal file.
+    replication_manager = ReplicationManager(nodes_db=nodes_db, port=port,
+                                             storage_engine=config.get('storage_engine', 'sqlite'),
+                                             read_policy=config.get('read_policy', 'power_of_two'),
+                                             read_quorum=config.get('read_quorum', 1),
+                                             recovery_mode=config.get('recovery_mode', 'sync'),
+                                             node_limits=config.get('node_limits'),
+                                             partitions=config.get('partitions', 1),
+                                             write_quorum=config.get('write_quorum', 1),
+                                             replication_log=config.get('replication_log'),
+                                             startup=config.get('startup', 'parallel'),
+                                             startup_workers=config.get('startup_workers'))
+    # Con l'avvio in background le richieste vengono accettate appena il primo nodo è pronto.
+    replication_manager.wait_ready(1)
+    # Esposto a chi avvia il server, che lo chiude allo spegnimento (salvando, ad esempio, i file di hint).
+    app.extensions['replication_manager'] = replication_manager
+    # Limita le richieste concorrenti e il ritmo delle richieste per token, se configurato.
+    admission_config = config.get('admission')
+    admission_controller = AdmissionController(**admission_config) if admission_config else None
+    # Campionamento delle trace e soglia del log delle richieste lente.
+    tracer = Tracer(**(config.get('tracing') or {}))
+    stream_chunk_size = config.get('stream_chunk_size', stream_chunk_size)
+
+    # Restituisce l'ID della richiesta in ogni risposta, per ritrovarla nel log delle richieste lente.
+    @app.after_request
+    def add_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+    # Avvia il rilevamento automatico dei guasti, se abilitato nella configurazione.
+    failure_detector_config = dict(config.get('failure_detector') or {})
+    if failure_detector_config.pop('enabled', False):
+        replication_manager.start_failure_detector(**failure_detector_config)
+    # Avvia l'eliminazione in background delle chiavi scadute, se abilitata nella configurazione.
+    expiry_reaper_config = dict(config.get('expiry_reaper') or {})
+    if expiry_reaper_config.pop('enabled', False):
+        replication_manager.start_expiry_reaper(**expiry_reaper_config)
 
     # Route per scrivere i dati.
     @app.route('/write', methods=['POST'])
@@ -42,11 +161,18 @@ def register_routes(app, config):
             return jsonify({'error': 'Invalid input', 'message': 'Key and value are required'}), 400
         key = data['key']
         value = data['value']
+        if reserved_key(key):
+            return jsonify({'error': 'Invalid input', 'message': RESERVED_KEY_MESSAGE}), 400
+        ttl = data.get('ttl')  # Durata opzionale della chiave, in secondi.
+        if invalid_ttl(ttl):
+            return jsonify({'error': 'Invalid input', 'message': 'TTL must be a positive number of seconds'}), 400
         try:
-            if replication_manager.key_exists_in_replicas(key):
+            # Controllo di esistenza e scrittura sono atomici rispetto alla chiave.
+            if not replication_manager.write_if_absent(key, value, ttl):
                 return jsonify({'error': 'Key already exists', 'message': f'The key {key} already exists'}), 409
-            replication_manager.write_to_replicas(key, value)
             return jsonify({'status': 'success', 'message': f'Key {key} written successfully'})
+        except Overloaded as e:
+            return overloaded_response(e)
         except Exception as e:
             return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
@@ -57,21 +183,141 @@ def register_routes(app, config):
         try:
             result = replication_manager.read_from_replicas(key)
             if result['value'] is not None:
-                return jsonify({'key': key, 'value': result['value'], 'message': result['message'], 'status': 'success'})
+                return jsonify({'key': key, 'value': result['value'], 'version': result.get('version'),
+                                'expires_at': result.get('expires_at'), 'message': result['message'],
+                                'status': 'success'})
             else:
                 return jsonify({'error': 'Key not found', 'message': result['message']}), 404
+        except Overloaded as e:
+            return overloaded_response(e)
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+    # Route per scrivere una chiave solo se valore e/o versione attuali coincidono con quelli attesi.
+    @app.route('/cas', methods=['POST'])
+    @require_api_token
+    def compare_and_set():
+        operation, error = parse_cas(request.json)
+        if error:
+            return jsonify({'error': 'Invalid input', 'message': error}), 400
+        try:
+            result = replication_manager.compare_and_set(**operation)
+            if not result['success']:
+                return jsonify({'error': 'Compare failed', 'message': f'The key {operation["key"]} has changed',
+                                'value': result['value'], 'version': result['version']}), 409
+            return jsonify({'status': 'success', **result})
+        except Overloaded as e:
+            return overloaded_response(e)
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+    # Route per eseguire più compare-and-set in una sola richiesta.
+    @app.route('/cas_batch', methods=['POST'])
+    @require_api_token
+    def compare_and_set_batch():
+        data = request.json
+        if not data or not isinstance(data.get('operations'), list):
+            return jsonify({'error': 'Invalid input', 'message': 'A list of operations is required'}), 400
+        operations = []
+        for op in data['operations']:
+            operation, error = parse_cas(op)
+            if error:
+                return jsonify({'error': 'Invalid input', 'message': error}), 400
+            operations.append(operation)
+        try:
+            return jsonify({'status': 'success', 'results': replication_manager.compare_and_set_many(operations)})
+        except Overloaded as e:
+            return overloaded_response(e)
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+    # Route per incrementare un contatore.
+    @app.route('/incr', methods=['POST'])
+    @require_api_token
+    def increment():
+        operation, error = parse_incr(request.json)
+        if error:
+            return jsonify({'error': 'Invalid input', 'message': error}), 400
+        try:
+            value = replication_manager.increment(**operation)
+            return jsonify({'status': 'success', 'key': operation['key'], 'value': value})
+        except ValueError as e:
+            return jsonify({'error': 'Invalid value', 'message': str(e)}), 409
+        except Overloaded as e:
+            return overloaded_response(e)
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+    # Route per incrementare più contatori in una sola richiesta.
+    @app.route('/incr_batch', methods=['POST'])
+    @require_api_token
+    def increment_batch():
+        data = request.json
+        if not data or not isinstance(data.get('operations'), list):
+            return jsonify({'error': 'Invalid input', 'message': 'A list of operations is required'}), 400
+        operations = []
+        for op in data['operations']:
+            operation, error = parse_incr(op)
+            if error:
+                return jsonify({'error': 'Invalid input', 'message': error}), 400
+            operations.append(operation)
+        try:
+            return jsonify({'status': 'success', 'results': replication_manager.increment_many(operations)})
+        except Overloaded as e:
+            return overloaded_response(e)
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+    # Route per caricare un valore grande in streaming: il corpo viene letto e replicato un chunk alla volta.
+    @app.route('/stream/<key>', methods=['PUT'])
+    @require_api_token
+    def write_stream(key):
+        chunk_size = request.args.get('chunk_size', stream_chunk_size, type=int)
+        if chunk_size <= 0:
+            return jsonify({'error': 'Invalid input', 'message': 'Chunk size must be a positive integer'}), 400
+        if reserved_key(key):
+            return jsonify({'error': 'Invalid input', 'message': RESERVED_KEY_MESSAGE}), 400
+        chunks = iter(lambda: request.stream.read(chunk_size), b'')
+        try:
+            result = replication_manager.write_stream(key, chunks)
+            return jsonify({'status': 'success', 'key': key, **result})
+        except ValueError as e:
+            return jsonify({'error': 'Key already exists', 'message': str(e)}), 409
+        except Overloaded as e:
+            return overloaded_response(e)
         except Exception as e:
             return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
+    # Route per scaricare in streaming un valore caricato con PUT /stream.
+    @app.route('/stream/<key>', methods=['GET'])
+    @require_api_token
+    def read_stream(key):
+        try:
+            manifest = replication_manager.read_stream_manifest(key)
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+        if manifest is None:
+            return jsonify({'error': 'Key not found', 'message': f'No streamed value for key {key}'}), 404
+        # I chunk vengono letti dalle repliche solo mentre la risposta viene inviata.
+        return Response(replication_manager.iter_stream(key, manifest), mimetype='application/octet-stream',
+                        headers={'Content-Length': str(manifest['size']),
+                                 'X-Value-Version': str(manifest['version'])})
+
     # Route per eliminare dati.
     @app.route('/delete/<key>', methods=['DELETE'])
     @require_api_token
     def delete(key):
         try:
-            if not replication_manager.key_exists_in_replicas(key):
+            # Elimina sia il valore normale sia un eventuale valore caricato in streaming (con i suoi chunk).
+            deleted = replication_manager.delete_stream(key)
+            if replication_manager.key_exists_in_replicas(key):
+                replication_manager.delete_from_replicas(key)
+                deleted = True
+            if not deleted:
                 return jsonify({'error': 'Key not found', 'message': 'Key does not exist'}), 404
-            replication_manager.delete_from_replicas(key)
             return jsonify({'status': 'success', 'message': f'Key {key} deleted successfully'})
+        except Overloaded as e:
+            return overloaded_response(e)
         except Exception as e:
             return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
@@ -95,6 +341,48 @@ def register_routes(app, config):
        except Exception as e:
            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
+    # Route per creare uno snapshot online di un nodo.
+    @app.route('/snapshot/<int:node_id>', methods=['POST'])
+    @require_api_token
+    def snapshot_node(node_id):
+        try:
+            snapshot = replication_manager.snapshot_node(node_id)
+            return jsonify({'status': 'success', 'message': f'Snapshot of node {node_id} created', **snapshot})
+        except ValueError as e:
+            return jsonify({'error': 'Node not found', 'message': str(e)}), 404
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+    # Route per ripristinare un nodo da uno snapshot.
+    @app.route('/restore/<int:node_id>', methods=['POST'])
+    @require_api_token
+    def restore_node(node_id):
+        data = request.json
+        if not data or 'snapshot' not in data:
+            return jsonify({'error': 'Invalid input', 'message': 'Snapshot name is required'}), 400
+        try:
+            replication_manager.restore_node(node_id, data['snapshot'])
+            return jsonify({'status': 'success', 'message': f'Node {node_id} restored from {data["snapshot"]}'})
+        except (ValueError, FileNotFoundError) as e:
+            return jsonify({'error': 'Not found', 'message': str(e)}), 404
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+    # Route per inizializzare un nodo da uno snapshot di un peer.
+    @app.route('/bootstrap/<int:node_id>', methods=['POST'])
+    @require_api_token
+    def bootstrap_node(node_id):
+        data = request.get_json(silent=True) or {}
+        try:
+            mode = replication_manager.bootstrap_node(node_id, data.get('source'))
+            return jsonify({'status': 'success', 'message': f'Node {node_id} bootstrapped ({mode})', 'mode': mode})
+        except ValueError as e:
+            return jsonify({'error': 'Node not found', 'message': str(e)}), 404
+        except RuntimeError as e:
+            return jsonify({'error': 'Invalid request', 'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
     # Route per recuperare lo stato di un nodo.
     @app.route('/nodes', methods=['GET'])
     @require_api_token
@@ -105,6 +393,54 @@ def register_routes(app, config):
         except Exception as e:
             return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
+    # Route di readiness: 200 quando almeno un nodo è pronto a servire richieste, 503 altrimenti.
+    # Non richiede il token e non passa dal controllo di ammissione: le sonde non devono ricevere 403 o 429.
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        ready_nodes = replication_manager.ready_nodes()
+        body = {'ready': ready_nodes > 0, 'ready_nodes': ready_nodes, 'nodes': len(replication_manager.nodes),
+                'warming_up': ready_nodes < len(replication_manager.nodes)}
+        return jsonify(body), 200 if ready_nodes else 503
+
+    # Route per le metriche di carico: richieste in esecuzione, in coda e rifiutate.
+    @app.route('/metrics', methods=['GET'])
+    @require_api_token
+    def metrics():
+        try:
+            return jsonify({
+                'status': 'success',
+                'admission': admission_controller.get_status() if admission_controller else None,
+                'nodes': {node.node_id: node.work_queue.get_status() if node.work_queue else None
+                          for node in replication_manager.nodes},
+            })
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
+    # Route per il log delle richieste lente, con gli span di ciascuna.
+    @app.route('/traces/slow', methods=['GET'])
+    @require_api_token
+    def slow_traces():
+        return jsonify({'status': 'success', 'slow_threshold_ms': tracer.slow_threshold * 1000,
+                        'requests': list(tracer.slow_requests)})
+
+    # Route per eseguire un profiling limitato nel tempo del server e scaricarne il risultato.
+    @app.route('/profile', methods=['POST'])
+    @require_api_token
+    def profile():
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode', 'cprofile')
+        seconds = data.get('seconds', 5)
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or seconds <= 0:
+            return jsonify({'error': 'Invalid input', 'message': 'Seconds must be a positive number'}), 400
+        try:
+            report = profiler.run(mode, seconds)
+        except ValueError as e:
+            return jsonify({'error': 'Invalid input', 'message': str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({'error': 'Profiling in progress', 'message': str(e)}), 409
+        return Response(report, mimetype='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename=profile_{mode}.txt'})
+
     # Route per settare la strategia di replicazione.
     @app.route('/set_replication_strategy', methods=['POST'])
     @require_api_token
@@ -121,6 +457,22 @@ def register_routes(app, config):
         except Exception as e:
             return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
 
+    # Route per settare la politica di instradamento delle letture.
+    @app.route('/set_read_policy', methods=['POST'])
+    @require_api_token
+    def set_read_policy():
+        data = request.json
+        if 'policy' not in data:
+            return jsonify({'error': 'Invalid input', 'message': 'Read policy is required'}), 400
+        policy = data.get('policy')
+        try:
+            replication_manager.set_read_policy(policy)
+            return jsonify({'status': 'success', 'message': f'Read policy set to {policy}'})
+        except ValueError as e:
+            return jsonify({'error': 'Invalid input', 'message': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
     # Route per ottenere i nodi responsabili di una chiave
     @app.route('/nodes_for_key/<key>', methods=['GET'])
     @require_api_token
@@ -0,0 +1,67 @@
+import itertools
+import random
+
+
+class ReadRouter:
+    """Politica di instradamento delle letture tra i nodi replica di una chiave."""
+
+    def order(self, nodes):
+        """Restituisce i nodi candidati nell'ordine in cui devono essere interrogati."""
+        return list(nodes)
+
+
+class FirstAliveRouter(ReadRouter):
+    """Interroga sempre i nodi nell'ordine dato (comportamento originale)."""
+
+
+class RoundRobinRouter(ReadRouter):
+    """Ruota il primo nodo interrogato a ogni lettura."""
+
+    def __init__(self):
+        self._counter = itertools.count()  # next() su itertools.count è atomico in CPython.
+
+    def order(self, nodes):
+        nodes = list(nodes)
+        if not nodes:
+            return nodes
+        start = next(self._counter) % len(nodes)
+        return nodes[start:] + nodes[:start]
+
+
+class PowerOfTwoRouter(ReadRouter):
+    """Sceglie due nodi a caso e preferisce quello con meno richieste in corso."""
+
+    def __init__(self, seed=None):
+        self._random = random.Random(seed)
+
+    def order(self, nodes):
+        nodes = list(nodes)
+        if len(nodes) < 2:
+            return nodes
+        first, second = self._random.sample(nodes, 2)
+        best = first if first.in_flight <= second.in_flight else second
+        return [best] + [node for node in nodes if node is not best]
+
+
+class LatencyEWMARouter(ReadRouter):
+    """Preferisce il nodo con la latenza media (EWMA) più bassa, pesata per il carico in corso."""
+
+    def order(self, nodes):
+        # I nodi mai interrogati hanno latenza 0 e vengono quindi esplorati per primi.
+        return sorted(nodes, key=lambda node: node.latency_ewma * (node.in_flight + 1))
+
+
+# Politiche disponibili, selezionabili tramite la chiave 'read_policy' della configurazione.
+ROUTERS = {
+    'first': FirstAliveRouter,
+    'round_robin': RoundRobinRouter,
+    'power_of_two': PowerOfTwoRouter,
+    'latency_ewma': LatencyEWMARouter,
+}
+
+
+def create_router(policy):
+    """Crea il router corrispondente alla politica `policy`."""
+    if policy not in ROUTERS:
+        raise ValueError(f"Unknown read policy '{policy}'")
+    return ROUTERS[policy]()
@@ -0,0 +1,180 @@
+import contextlib
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from .models import ReplicaNode, ReplicationManager
+
+
+class ClusterSimulator:
+    """Simulatore deterministico di guasti e recuperi su un cluster di grandi dimensioni.
+
+    Carica `keys` chiavi in un ReplicationManager con `nodes` nodi (storage in
+    memoria) e applica una sequenza di eventi fail/recover/add/remove generata
+    da un seme: a parità di parametri e seme la sequenza e i dati spostati sono
+    sempre gli stessi. Per ogni evento misura:
+      - data_moved: record scritti o eliminati sui nodi (dal log delle modifiche);
+      - duration_ms: tempo impiegato dall'operazione di fallimento/recupero;
+      - unavailable_keys: chiavi non leggibili su un campione fisso di chiavi;
+      - imbalance: numero massimo di chiavi per nodo attivo diviso per la media.
+    """
+
+    def __init__(self, nodes=100, keys=100000, strategy='consistent', replication_factor=3, seed=0,
+                 sample_size=1000, db_dir=None):
+        self.seed = seed
+        self.keys = keys
+        self.strategy = strategy
+        self.random = random.Random(seed)
+        self._own_db_dir = db_dir is None
+        self.db_dir = db_dir or tempfile.mkdtemp(prefix='simulator_')
+        with self._quiet():
+            self.manager = ReplicationManager(nodes_db=nodes, strategy=strategy, replication_factor=replication_factor,
+                                              storage_engine='memory', db_dir=self.db_dir, read_policy='first')
+        self.removed = set()  # Nodi rimossi definitivamente dal cluster.
+        self.sample = sorted(self.random.sample(range(keys), min(sample_size, keys)))  # Chiavi controllate.
+        self.results = []
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _quiet():
+        # I metodi del cluster stampano una riga per chiave: durante la simulazione l'output viene scartato.
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    def _owners(self, key):
+        # Nodi responsabili della chiave secondo la strategia corrente.
+        if self.strategy == 'consistent':
+            return self.manager.consistent_hash.get_nodes_for_key(key)
+        return [node for node in self.manager.nodes if node.node_id not in self.removed]
+
+    def load(self, batch_size=10000):
+        """Carica le chiavi direttamente negli storage dei nodi responsabili, a batch."""
+        with self._quiet():
+            for start in range(0, self.keys, batch_size):
+                batches = {}
+                for i in range(start, min(start + batch_size, self.keys)):
+                    key = f'key_{i}'
+                    for node in self._owners(key):
+                        batches.setdefault(node, []).append((key, f'value_{i}', 1, None))
+                for node, rows in batches.items():
+                    node.engine.write_batch(rows)
+
+    def _changes(self):
+        return sum(node.change_seq for node in self.manager.nodes)
+
+    def _unavailable_keys(self):
+        with self._quiet():
+            return sum(1 for i in self.sample if self.manager.read_from_replicas(f'key_{i}')['value'] is None)
+
+    def _imbalance(self):
+        counts = [len(node.get_all_records()) for node in self.manager.nodes if node.is_alive()]
+        mean = sum(counts) / len(counts) if counts else 0
+        return round(max(counts) / mean, 3) if mean else 0.0
+
+    def _next_event(self):
+        # Sceglie un evento applicabile allo stato corrente del cluster.
+        alive = [node for node in self.manager.nodes if node.is_alive()]
+        failed = [node for node in self.manager.nodes if not node.is_alive() and node.node_id not in self.removed]
+        choices = ['add']
+        if len(alive) > 1:
+            choices += ['fail', 'remove']
+        if failed:
+            choices.append('recover')
+        event = self.random.choice(choices)
+        if event == 'recover':
+            return event, self.random.choice(failed)
+        if event in ('fail', 'remove'):
+            return event, self.random.choice(alive)
+        return event, None
+
+    def step(self):
+        """Esegue un evento casuale e restituisce le metriche misurate."""
+        event, node = self._next_event()
+        changes = self._changes()
+        start_time = time.perf_counter()
+        with self._quiet():
+            if event == 'fail':
+                self.manager.fail_node(node.node_id)
+            elif event == 'recover':
+                self.manager.recover_node(node.node_id)
+            elif event == 'add':
+                node = self.add_node()
+            else:
+                self.remove_node(node)
+        duration = time.perf_counter() - start_time
+        result = {
+            'event': event,
+            'node_id': node.node_id,
+            'data_moved': self._changes() - changes,
+            'duration_ms': round(duration * 1000, 3),
+            'unavailable_keys': self._unavailable_keys(),
+            'imbalance': self._imbalance(),
+        }
+        self.results.append(result)
+        return result
+
+    def add_node(self):
+        """Aggiunge un nodo al cluster e gli trasferisce le chiavi di cui diventa responsabile."""
+        manager = self.manager
+        node = ReplicaNode(len(manager.nodes), manager.nodes[0].port + len(manager.nodes), 'memory', self.db_dir)
+        with manager.topology_lock.write_lock():
+            manager.nodes.append(node)
+            manager.nodes_db += 1
+            if self.strategy == 'consistent':
+                manager.consistent_hash.add_node(node)
+        if self.strategy == 'consistent':
+            self._rebalance([peer for peer in manager.nodes if peer.is_alive() and peer is not node])
+        else:
+            node.sync_with_active_nodes(manager.nodes, key_lock=manager.key_locks.lock)
+        return node
+
+    def remove_node(self, node):
+        """Rimuove definitivamente un nodo, copiandone prima le chiavi sui nuovi responsabili."""
+        manager = self.manager
+        with manager.topology_lock.write_lock():
+            node.fail()
+            self.removed.add(node.node_id)
+            if self.strategy == 'consistent':
+                manager.consistent_hash.remove_node(node)
+        if self.strategy == 'consistent':
+            # Rimozione programmata: anche il nodo uscente fa da sorgente per le sue chiavi.
+            self._rebalance([peer for peer in manager.nodes if peer.is_alive()] + [node])
+
+    def _rebalance(self, sources):
+        # Allinea ogni chiave ai suoi responsabili attuali: la copia sui nuovi responsabili e la elimina
+        # dai nodi attivi che non ne sono più responsabili.
+        manager = self.manager
+        with manager.topology_lock.read_lock():
+            for source in sources:
+                for key, value, version, expires_at in source.get_all_records():
+                    owners = self._owners(key)
+                    with manager.key_locks.lock(key):
+                        for owner in owners:
+                            if owner.is_alive():
+                                owner.write_if_newer(key, value, version, expires_at)
+                        if source not in owners and source.is_alive():
+                            source.purge(key)
+
+    def run(self, events=20):
+        """Carica le chiavi ed esegue `events` eventi; restituisce l'elenco delle metriche."""
+        self.load()
+        for _ in range(events):
+            self.step()
+        return self.results
+
+    def summary(self):
+        """Riassume le metriche di tutti gli eventi eseguiti."""
+        return {
+            'events': len(self.results),
+            'data_moved': sum(result['data_moved'] for result in self.results),
+            'total_duration_ms': round(sum(result['duration_ms'] for result in self.results), 3),
+            'max_unavailable_keys': max((result['unavailable_keys'] for result in self.results), default=0),
+            'max_imbalance': max((result['imbalance'] for result in self.results), default=0.0),
+        }
+
+    def close(self):
+        self.manager.close()
+        if self._own_db_dir:
+            shutil.rmtree(self.db_dir, ignore_errors=True)
@@ -0,0 +1,849 @@
+import glob
+import heapq
+import json
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class StorageEngine:
+    """Interfaccia comune dei motori di storage usati da ReplicaNode.
+
+    Ogni record ha una versione e, opzionalmente, un istante di scadenza
+    assoluto (expires_at, secondi epoch): i record scaduti sono invisibili alle
+    letture e vengono eliminati fisicamente da delete_expired().
+
+    Un record con valore None è un tombstone: registra la versione di una
+    cancellazione, così write_if_newer non fa rivivere una chiave cancellata
+    con una copia più vecchia. I tombstone sono invisibili alle letture (tranne
+    read_version) e spariscono alla loro scadenza come gli altri record.
+    """
+
+    def write(self, key, value, version=0, expires_at=None):
+        """Scrive (o sovrascrive) una coppia chiave-valore con la sua versione e scadenza."""
+        raise NotImplementedError
+
+    def write_if_newer(self, key, value, version, expires_at=None):
+        """Scrive la coppia solo se la versione è più recente di quella memorizzata; restituisce True se scritta."""
+        raise NotImplementedError
+
+    def write_batch(self, rows):
+        """Applica write_if_newer a una lista di record (chiave, valore, versione, scadenza)."""
+        for key, value, version, expires_at in rows:
+            self.write_if_newer(key, value, version, expires_at)
+
+    def read(self, key):
+        """Restituisce il valore associato alla chiave, oppure None."""
+        record = self.read_record(key)
+        return record[0] if record else None
+
+    def read_record(self, key):
+        """Restituisce la tupla (valore, versione, scadenza) associata alla chiave, oppure None."""
+        raise NotImplementedError
+
+    def read_version(self, key):
+        """Come read_record, ma restituisce anche i tombstone (con valore None)."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Elimina fisicamente la chiave (e il suo eventuale tombstone), se presente."""
+        raise NotImplementedError
+
+    def key_exists(self, key):
+        """Verifica se la chiave è presente."""
+        return self.read(key) is not None
+
+    def items(self):
+        """Restituisce tutte le coppie (chiave, valore) memorizzate."""
+        return [(key, value) for key, value, _, _ in self.records()]
+
+    def records(self):
+        """Restituisce tutti i record (chiave, valore, versione, scadenza) memorizzati."""
+        raise NotImplementedError
+
+    def delete_expired(self, now, limit):
+        """Elimina al massimo `limit` chiavi scadute entro `now`; restituisce quante ne ha eliminate."""
+        raise NotImplementedError
+
+    def snapshot(self, dest_path):
+        """Copia il contenuto corrente in un file SQLite (formato comune a tutti i motori)."""
+        conn = sqlite3.connect(dest_path)
+        try:
+            create_schema(conn)
+            conn.executemany('''INSERT OR REPLACE INTO kv_store (key, value, version, expires_at) VALUES (?, ?, ?, ?)''',
+                             self.records())
+            conn.commit()
+        finally:
+            conn.close()
+
+    def restore(self, src_path):
+        """Sostituisce l'intero contenuto del motore con quello di uno snapshot."""
+        self.replace_records(snapshot_rows(src_path))
+
+    def replace_records(self, rows):
+        """Sostituisce l'intero contenuto del motore con i record (chiave, valore, versione, scadenza) dati."""
+        for key, _ in self.items():
+            self.delete(key)
+        for key, value, version, expires_at in rows:
+            self.write(key, value, version, expires_at)
+
+    def close(self):
+        """Rilascia le risorse del motore (connessioni, file, mmap)."""
+
+
+def create_schema(conn):
+    """Crea la tabella kv_store e il suo indice di scadenza, se non esistono."""
+    conn.execute(
+        '''CREATE TABLE IF NOT EXISTS kv_store (key TEXT PRIMARY KEY, value TEXT, version INTEGER NOT NULL DEFAULT 0,
+           expires_at REAL)''')
+    # Aggiunge le colonne introdotte dopo la creazione dei database esistenti.
+    columns = {row[1] for row in conn.execute('''PRAGMA table_info(kv_store)''')}
+    if 'version' not in columns:
+        conn.execute('''ALTER TABLE kv_store ADD COLUMN version INTEGER NOT NULL DEFAULT 0''')
+    if 'expires_at' not in columns:
+        conn.execute('''ALTER TABLE kv_store ADD COLUMN expires_at REAL''')
+    # Indice parziale sulle sole chiavi con scadenza: il reaper lo scorre per intervalli.
+    conn.execute(
+        '''CREATE INDEX IF NOT EXISTS kv_store_expires_at ON kv_store (expires_at) WHERE expires_at IS NOT NULL''')
+
+
+def is_expired(expires_at, now=None):
+    """Verifica se una scadenza (None = mai) è già passata."""
+    return expires_at is not None and expires_at <= (time.time() if now is None else now)
+
+
+class ExpiryIndex:
+    """Min-heap di (scadenza, chiave) per i motori senza un indice SQL.
+
+    Le voci non vengono rimosse quando una chiave è riscritta o cancellata:
+    vengono scartate quando arrivano in cima allo heap se non corrispondono più
+    al record corrente.
+    """
+
+    def __init__(self):
+        self._heap = []
+
+    def add(self, key, expires_at):
+        if expires_at is not None:
+            heapq.heappush(self._heap, (expires_at, key))
+
+    def pop_due(self, now, limit, current_expiry):
+        """Estrae fino a `limit` chiavi scadute; current_expiry(key) restituisce la scadenza attuale della chiave."""
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < limit:
+            expires_at, key = heapq.heappop(self._heap)
+            if current_expiry(key) == expires_at:
+                due.append(key)
+        return due
+
+
+class SQLiteEngine(StorageEngine):
+    """Motore basato su un file SQLite con una singola tabella kv_store.
+
+    Le scritture passano da un'unica connessione protetta da un lock. Le letture
+    usano un piccolo pool di connessioni dedicate, una per lettura in corso: in
+    modalità WAL i lettori procedono in parallelo tra loro e con lo scrittore,
+    e vedono sempre le transazioni già confermate.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()  # La connessione di scrittura è condivisa tra i thread del server.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # In modalità WAL i lettori (inclusi gli snapshot) non bloccano gli scrittori.
+        self._conn.execute('''PRAGMA journal_mode=WAL''')
+        create_schema(self._conn)
+        self._conn.commit()
+        self._readers = []  # Connessioni di lettura libere, riusate dalle letture successive.
+        self._readers_lock = threading.Lock()
+
+    @contextmanager
+    def _reader(self):
+        # Presta una connessione di lettura libera (o ne apre una nuova) per la durata del blocco.
+        with self._readers_lock:
+            conn = self._readers.pop() if self._readers else None
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            with self._readers_lock:
+                self._readers.append(conn)
+
+    def write(self, key, value, version=0, expires_at=None):
+        with self._lock:
+            self._conn.execute('''INSERT OR REPLACE INTO kv_store (key, value, version, expires_at) VALUES (?, ?, ?, ?)''',
+                               (key, value, version, expires_at))
+            self._conn.commit()
+
+    def write_if_newer(self, key, value, version, expires_at=None):
+        with self._lock:
+            # Una copia locale scaduta equivale a una chiave assente e viene sempre sovrascritta.
+            cursor = self._conn.execute(
+                '''INSERT INTO kv_store (key, value, version, expires_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET value=excluded.value, version=excluded.version,
+                   expires_at=excluded.expires_at
+                   WHERE excluded.version > kv_store.version OR kv_store.expires_at <= ?''',
+                (key, value, version, expires_at, time.time()))
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    def write_batch(self, rows):
+        # Un'unica transazione per tutto il batch invece di un commit per record.
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                '''INSERT INTO kv_store (key, value, version, expires_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET value=excluded.value, version=excluded.version,
+                   expires_at=excluded.expires_at
+                   WHERE excluded.version > kv_store.version OR kv_store.expires_at <= ?''',
+                [(key, value, version, expires_at, now) for key, value, version, expires_at in rows])
+            self._conn.commit()
+
+    def read(self, key):
+        with self._reader() as conn:
+            result = conn.execute(
+                '''SELECT value FROM kv_store WHERE key=? AND value IS NOT NULL
+                   AND (expires_at IS NULL OR expires_at > ?)''', (key, time.time())).fetchone()
+        return result[0] if result else None
+
+    def read_record(self, key):
+        with self._reader() as conn:
+            return conn.execute(
+                '''SELECT value, version, expires_at FROM kv_store
+                   WHERE key=? AND value IS NOT NULL AND (expires_at IS NULL OR expires_at > ?)''',
+                (key, time.time())).fetchone()
+
+    def read_version(self, key):
+        with self._reader() as conn:
+            return conn.execute(
+                '''SELECT value, version, expires_at FROM kv_store
+                   WHERE key=? AND (expires_at IS NULL OR expires_at > ?)''', (key, time.time())).fetchone()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('''DELETE FROM kv_store WHERE key=?''', (key,))
+            self._conn.commit()
+
+    def key_exists(self, key):
+        with self._reader() as conn:
+            return conn.execute(
+                '''SELECT 1 FROM kv_store WHERE key=? AND value IS NOT NULL AND (expires_at IS NULL OR expires_at > ?)''',
+                (key, time.time())).fetchone() is not None
+
+    def items(self):
+        with self._reader() as conn:
+            return conn.execute(
+                '''SELECT key, value FROM kv_store WHERE value IS NOT NULL AND (expires_at IS NULL OR expires_at > ?)''',
+                (time.time(),)).fetchall()
+
+    def records(self):
+        with self._reader() as conn:
+            return conn.execute(
+                '''SELECT key, value, version, expires_at FROM kv_store
+                   WHERE value IS NOT NULL AND (expires_at IS NULL OR expires_at > ?)''',
+                (time.time(),)).fetchall()
+
+    def delete_expired(self, now, limit):
+        with self._lock:
+            # Scansione per intervallo sull'indice expires_at, limitata a un batch per non bloccare gli scrittori.
+            cursor = self._conn.execute(
+                '''DELETE FROM kv_store WHERE key IN
+                   (SELECT key FROM kv_store WHERE expires_at IS NOT NULL AND expires_at <= ? LIMIT ?)''',
+                (now, limit))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def snapshot(self, dest_path):
+        # Backup online: una connessione dedicata copia le pagine del database in un'unica transazione di
+        # lettura; grazie al WAL gli scrittori sulla connessione principale non vengono bloccati.
+        src = sqlite3.connect(self.path)
+        dst = sqlite3.connect(dest_path)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+
+    def restore(self, src_path):
+        if snapshot_partitions(src_path):
+            # Snapshot di un nodo partizionato: i record vengono riuniti in questo database.
+            self.replace_records(snapshot_rows(src_path))
+            return
+        # Sostituisce il database pagina per pagina tramite l'API di backup.
+        src = sqlite3.connect(src_path)
+        try:
+            create_schema(src)  # Snapshot di versioni precedenti dello schema.
+            src.commit()
+            with self._lock:
+                src.backup(self._conn)
+        finally:
+            src.close()
+
+    def replace_records(self, rows):
+        # Usato dal ripristino delle partizioni: un'unica transazione invece di una scrittura per chiave.
+        with self._lock:
+            self._conn.execute('''DELETE FROM kv_store''')
+            self._conn.executemany(
+                '''INSERT OR REPLACE INTO kv_store (key, value, version, expires_at) VALUES (?, ?, ?, ?)''', rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+
+
+class MemoryEngine(StorageEngine):
+    """Motore in memoria, senza persistenza: pensato per test e benchmark."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}  # key -> (valore, versione, scadenza)
+        self._expiry = ExpiryIndex()
+
+    def _current(self, key):
+        # Record non scaduto associato alla chiave (anche un tombstone), oppure None.
+        record = self._data.get(key)
+        return record if record is not None and not is_expired(record[2]) else None
+
+    def _visible(self, key):
+        record = self._current(key)
+        return record if record is not None and record[0] is not None else None
+
+    def write(self, key, value, version=0, expires_at=None):
+        with self._lock:
+            self._data[key] = (value, version, expires_at)
+            self._expiry.add(key, expires_at)
+
+    def write_if_newer(self, key, value, version, expires_at=None):
+        with self._lock:
+            current = self._current(key)
+            if current is not None and current[1] >= version:
+                return False
+            self._data[key] = (value, version, expires_at)
+            self._expiry.add(key, expires_at)
+            return True
+
+    def read_record(self, key):
+        with self._lock:
+            return self._visible(key)
+
+    def read_version(self, key):
+        with self._lock:
+            return self._current(key)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def key_exists(self, key):
+        with self._lock:
+            return self._visible(key) is not None
+
+    def records(self):
+        now = time.time()
+        with self._lock:
+            return [(key, value, version, expires_at) for key, (value, version, expires_at) in self._data.items()
+                    if value is not None and not is_expired(expires_at, now)]
+
+    def delete_expired(self, now, limit):
+        with self._lock:
+            due = self._expiry.pop_due(now, limit, lambda key: self._data[key][2] if key in self._data else None)
+            for key in due:
+                del self._data[key]
+            return len(due)
+
+
+class LogStructuredEngine(StorageEngine):
+    """Motore log-structured in stile Bitcask.
+
+    Ogni scrittura viene accodata a un unico file di log; un indice in memoria
+    mappa ogni chiave all'offset del suo valore più recente, e le letture
+    avvengono tramite mmap del file. Le cancellazioni scrivono un tombstone e
+    lo spazio occupato dai record obsoleti viene recuperato da una compattazione
+    eseguita in background. Le cancellazioni fisiche (delete, scadenze)
+    rimuovono la chiave dall'indice; i tombstone versionati (valore None)
+    restano invece nell'indice fino alla loro scadenza.
+
+    Alla chiusura l'indice viene salvato in un file di hint compatto accanto al
+    log: all'apertura successiva l'indice viene caricato da lì senza rileggere
+    i valori, scorrendo solo l'eventuale coda del log scritta dopo l'hint.
+    L'hint viene rimosso appena caricato, quindi dopo un crash si torna alla
+    scansione completa del log.
+    """
+
+    # Header di ogni record: crc32, lunghezza chiave, lunghezza valore (-1 = cancellazione fisica,
+    # -2 = tombstone versionato), versione, scadenza (0 = nessuna scadenza).
+    HEADER = struct.Struct('>IIiQd')
+    PURGED = -1
+    TOMBSTONE = -2
+    # File di hint: magic, dimensione del log coperta, byte obsoleti, numero di voci; ogni voce è
+    # lunghezza chiave, offset del valore, lunghezza del valore, versione, scadenza, seguita dalla chiave.
+    # Il file termina con il crc32 di tutto il contenuto precedente.
+    HINT_MAGIC = b'KVH1'
+    HINT_HEADER = struct.Struct('>4sQQI')
+    HINT_ENTRY = struct.Struct('>IQiQd')
+
+    def __init__(self, path, compaction_ratio=0.5, compaction_min_bytes=1024 * 1024):
+        self.path = path
+        self.hint_path = path + '.hint'  # Indice salvato alla chiusura.
+        self.compaction_ratio = compaction_ratio  # Frazione di byte obsoleti che avvia la compattazione.
+        self.compaction_min_bytes = compaction_min_bytes  # Sotto questa soglia non conviene compattare.
+        self._lock = threading.Lock()
+        self._index = {}  # key -> (offset del valore, lunghezza del valore, versione, scadenza)
+        self._expiry = ExpiryIndex()
+        self._size = 0  # Dimensione valida del file di log.
+        self._dead_bytes = 0  # Byte occupati da record sovrascritti, cancellati o tombstone.
+        self._mmap = None
+        self._compaction_thread = None
+        self._compaction_lock = threading.Lock()  # Serializza compattazioni manuali e in background.
+        if not os.path.exists(path):
+            open(path, 'wb').close()
+        self._load()
+        self._file = open(path, 'ab')
+
+    # --- Formato dei record ---
+
+    def _encode(self, key, value, version=0, expires_at=None, purge=False):
+        key_bytes = key.encode('utf-8')
+        if value is None:
+            value_bytes, value_len = b'', self.PURGED if purge else self.TOMBSTONE
+        else:
+            value_bytes = str(value).encode('utf-8')
+            value_len = len(value_bytes)
+        fields = (len(key_bytes), value_len, version, expires_at or 0.0)
+        crc = zlib.crc32(self.HEADER.pack(0, *fields)[4:] + key_bytes + value_bytes)
+        return self.HEADER.pack(crc, *fields) + key_bytes + value_bytes
+
+    def _iter_records(self, buf, start, end):
+        """Scorre i record validi in buf[start:end]; si ferma al primo record troncato o corrotto."""
+        offset = start
+        while offset + self.HEADER.size <= end:
+            crc, key_len, value_len, version, expires_at = self.HEADER.unpack_from(buf, offset)
+            body = offset + self.HEADER.size
+            record_end = body + key_len + max(value_len, 0)
+            if record_end > end:
+                break
+            if zlib.crc32(bytes(buf[offset + 4:record_end])) != crc:
+                break
+            key = bytes(buf[body:body + key_len]).decode('utf-8')
+            yield offset, record_end, key, (body + key_len, value_len, version, expires_at or None)
+            offset = record_end
+
+    def _apply(self, index, key, entry, record_size):
+        """Aggiorna un indice con un record e restituisce i byte diventati obsoleti."""
+        dead = 0
+        previous = index.pop(key, None)
+        if previous is not None:
+            dead += self.HEADER.size + len(key.encode('utf-8')) + max(previous[1], 0)
+        if entry[1] == self.PURGED:
+            dead += record_size  # Il record di rimozione stesso non contiene dati vivi.
+        else:
+            index[key] = entry
+            if index is self._index:
+                self._expiry.add(key, entry[3])
+        return dead
+
+    def _load(self):
+        # Ricostruisce l'indice dal file di hint, se valido, e dai record del log che non copre.
+        log_size = os.path.getsize(self.path)
+        valid_end = self._load_hint(log_size)
+        if valid_end < log_size:
+            # Solo la coda non coperta dall'hint viene letta: la parte precedente della mmap non viene mai toccata.
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for offset, record_end, key, entry in self._iter_records(data, valid_end, log_size):
+                    self._dead_bytes += self._apply(self._index, key, entry, record_end - offset)
+                    valid_end = record_end
+        if valid_end < log_size:
+            # Coda troncata da un crash durante una scrittura: viene scartata.
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_end)
+        self._size = valid_end
+
+    def _load_hint(self, log_size):
+        # Carica l'indice dal file di hint e restituisce la dimensione del log che copre (0 = hint assente o non valido).
+        if not os.path.exists(self.hint_path):
+            return 0
+        with open(self.hint_path, 'rb') as f:
+            hint = f.read()
+        os.remove(self.hint_path)  # Da qui in poi il log cambia: l'hint non sarebbe più affidabile.
+        if len(hint) < self.HINT_HEADER.size + 4 or zlib.crc32(hint[:-4]) != struct.unpack('>I', hint[-4:])[0]:
+            return 0
+        magic, size, dead_bytes, count = self.HINT_HEADER.unpack_from(hint, 0)
+        if magic != self.HINT_MAGIC or size > log_size:
+            return 0
+        offset = self.HINT_HEADER.size
+        for _ in range(count):
+            key_len, value_offset, value_len, version, expires_at = self.HINT_ENTRY.unpack_from(hint, offset)
+            offset += self.HINT_ENTRY.size
+            key = hint[offset:offset + key_len].decode('utf-8')
+            offset += key_len
+            self._index[key] = (value_offset, value_len, version, expires_at or None)
+            self._expiry.add(key, expires_at or None)
+        self._dead_bytes = dead_bytes
+        return size
+
+    def _write_hint(self):
+        # Salva l'indice nel file di hint (chiamato alla chiusura, con il lock acquisito).
+        parts = [self.HINT_HEADER.pack(self.HINT_MAGIC, self._size, self._dead_bytes, len(self._index))]
+        for key, (value_offset, value_len, version, expires_at) in self._index.items():
+            key_bytes = key.encode('utf-8')
+            parts.append(self.HINT_ENTRY.pack(len(key_bytes), value_offset, value_len, version, expires_at or 0.0))
+            parts.append(key_bytes)
+        body = b''.join(parts)
+        tmp_path = self.hint_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body + struct.pack('>I', zlib.crc32(body)))
+        os.replace(tmp_path, self.hint_path)
+
+    def _view(self, end):
+        # Restituisce una mmap che copre almeno i primi `end` byte del log.
+        if self._mmap is None or len(self._mmap) < end:
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self.path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def _value(self, entry):
+        value_offset, value_len = entry[0], entry[1]
+        view = self._view(value_offset + value_len)
+        return view[value_offset:value_offset + value_len].decode('utf-8')
+
+    def _append(self, key, value, version=0, expires_at=None, purge=False):
+        record = self._encode(key, value, version, expires_at, purge)
+        self._file.write(record)
+        self._file.flush()
+        self._size += len(record)
+        value_len = len(record) - self.HEADER.size - len(key.encode('utf-8'))
+        if value is None:
+            value_len = self.PURGED if purge else self.TOMBSTONE
+        entry = (self._size - max(value_len, 0), value_len, version, expires_at)
+        self._dead_bytes += self._apply(self._index, key, entry, len(record))
+
+    def _current(self, key):
+        # Voce dell'indice non scaduta associata alla chiave (anche un tombstone), oppure None.
+        entry = self._index.get(key)
+        return entry if entry is not None and not is_expired(entry[3]) else None
+
+    def _visible(self, key):
+        entry = self._current(key)
+        return entry if entry is not None and entry[1] != self.TOMBSTONE else None
+
+    # --- Operazioni ---
+
+    def write(self, key, value, version=0, expires_at=None):
+        with self._lock:
+            self._append(key, value, version, expires_at)
+        self._maybe_compact()
+
+    def write_if_newer(self, key, value, version, expires_at=None):
+        with self._lock:
+            current = self._current(key)
+            if current is not None and current[2] >= version:
+                return False
+            self._append(key, value, version, expires_at)
+        self._maybe_compact()
+        return True
+
+    def read(self, key):
+        with self._lock:
+            entry = self._visible(key)
+            return self._value(entry) if entry is not None else None
+
+    def read_record(self, key):
+        with self._lock:
+            entry = self._visible(key)
+            return (self._value(entry), entry[2], entry[3]) if entry is not None else None
+
+    def read_version(self, key):
+        with self._lock:
+            entry = self._current(key)
+            if entry is None:
+                return None
+            return (None if entry[1] == self.TOMBSTONE else self._value(entry), entry[2], entry[3])
+
+    def delete(self, key):
+        with self._lock:
+            if key not in self._index:
+                return
+            self._append(key, None, purge=True)
+        self._maybe_compact()
+
+    def key_exists(self, key):
+        with self._lock:
+            return self._visible(key) is not None
+
+    def records(self):
+        now = time.time()
+        with self._lock:
+            return [(key, self._value(entry), entry[2], entry[3]) for key, entry in self._index.items()
+                    if entry[1] != self.TOMBSTONE and not is_expired(entry[3], now)]
+
+    def delete_expired(self, now, limit):
+        with self._lock:
+            due = self._expiry.pop_due(now, limit, lambda key: self._index[key][3] if key in self._index else None)
+            for key in due:
+                self._append(key, None, purge=True)  # La scadenza sopravvive così anche a un riavvio.
+        self._maybe_compact()
+        return len(due)
+
+    def close(self):
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        with self._lock:
+            self._file.close()
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._write_hint()
+
+    # --- Compattazione ---
+
+    def _maybe_compact(self):
+        with self._lock:
+            if self._dead_bytes < self.compaction_min_bytes or self._dead_bytes < self._size * self.compaction_ratio:
+                return
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+            self._compaction_thread.start()
+
+    def compact(self):
+        """Riscrive il log mantenendo solo i valori vivi.
+
+        La copia dei dati avviene senza lock, da una fotografia dell'indice; solo
+        i record accodati nel frattempo vengono riapplicati sotto lock prima di
+        sostituire il file.
+        """
+        with self._compaction_lock:
+            self._compact()
+
+    def _compact(self):
+        tmp_path = self.path + '.compact'
+        with self._lock:
+            snapshot = dict(self._index)
+            snapshot_end = self._size
+
+        new_index = {}
+        with open(tmp_path, 'wb') as out:
+            new_size = 0
+            if snapshot:
+                # Mmap privata: quella condivisa può essere rimappata dalle letture concorrenti.
+                with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), snapshot_end, access=mmap.ACCESS_READ) as view:
+                    now = time.time()
+                    for key, (offset, length, version, expires_at) in snapshot.items():
+                        if is_expired(expires_at, now):
+                            continue  # I record scaduti non vengono copiati.
+                        value = None if length == self.TOMBSTONE else view[offset:offset + length].decode('utf-8')
+                        record = self._encode(key, value, version, expires_at)
+                        out.write(record)
+                        new_size += len(record)
+                        new_index[key] = (new_size - max(length, 0), length, version, expires_at)
+
+            with self._lock:
+                # Riapplica i record scritti durante la copia, tombstone inclusi.
+                dead = 0
+                if self._size > snapshot_end:
+                    tail = self._view(self._size)
+                    for offset, record_end, key, entry in self._iter_records(tail, snapshot_end, self._size):
+                        out.write(tail[offset:record_end])
+                        moved = (new_size + (entry[0] - offset),) + entry[1:]
+                        dead += self._apply(new_index, key, moved, record_end - offset)
+                        new_size += record_end - offset
+                out.flush()
+                os.fsync(out.fileno())
+                out.close()
+
+                # Sostituisce il log: handle e mmap vengono chiusi prima del rename.
+                self._file.close()
+                if self._mmap is not None:
+                    self._mmap.close()
+                    self._mmap = None
+                os.replace(tmp_path, self.path)
+                self._file = open(self.path, 'ab')
+                self._index = new_index
+                self._size = new_size
+                self._dead_bytes = dead
+
+
+class PartitionedEngine(StorageEngine):
+    """Suddivide le chiavi di un nodo tra K motori indipendenti in base all'hash della chiave.
+
+    Ogni partizione ha il proprio file, la propria connessione e il proprio
+    lock, quindi scritture su partizioni diverse procedono in parallelo invece
+    di serializzarsi sull'unico lock di scrittura di SQLite. Le scansioni
+    complete (sincronizzazione, snapshot) e il ripristino leggono e scrivono le
+    partizioni in parallelo.
+
+    Uno snapshot è composto da un file per partizione (`<snapshot>.p<i>`, creato
+    con lo snapshot della partizione, quindi con l'API di backup di SQLite) e da
+    un piccolo manifest JSON nel percorso dello snapshot stesso.
+    """
+
+    def __init__(self, kind, base_path, partitions):
+        engine_class, extension = ENGINES[kind]
+        self.path = f'{base_path}_p*{extension}'  # Schema dei percorsi delle partizioni.
+        self._executor = ThreadPoolExecutor(max_workers=partitions, thread_name_prefix='partition')
+        # Anche l'apertura delle partizioni (caricamento degli indici) avviene in parallelo.
+        self.partitions = list(self._executor.map(lambda i: engine_class(f'{base_path}_p{i}{extension}'),
+                                                  range(partitions)))
+
+    def _index(self, key):
+        return zlib.crc32(key.encode('utf-8')) % len(self.partitions)
+
+    def _partition(self, key):
+        return self.partitions[self._index(key)]
+
+    def write(self, key, value, version=0, expires_at=None):
+        self._partition(key).write(key, value, version, expires_at)
+
+    def write_if_newer(self, key, value, version, expires_at=None):
+        return self._partition(key).write_if_newer(key, value, version, expires_at)
+
+    def write_batch(self, rows):
+        groups = [[] for _ in self.partitions]
+        for row in rows:
+            groups[self._index(row[0])].append(row)
+        list(self._executor.map(lambda args: args[0].write_batch(args[1]), zip(self.partitions, groups)))
+
+    def read(self, key):
+        return self._partition(key).read(key)
+
+    def read_record(self, key):
+        return self._partition(key).read_record(key)
+
+    def read_version(self, key):
+        return self._partition(key).read_version(key)
+
+    def delete(self, key):
+        self._partition(key).delete(key)
+
+    def key_exists(self, key):
+        return self._partition(key).key_exists(key)
+
+    def items(self):
+        return [item for items in self._executor.map(lambda partition: partition.items(), self.partitions)
+                for item in items]
+
+    def records(self):
+        return [record for records in self._executor.map(lambda partition: partition.records(), self.partitions)
+                for record in records]
+
+    def delete_expired(self, now, limit):
+        # Le partizioni vengono svuotate una dopo l'altra fino a esaurire il batch.
+        deleted = 0
+        for partition in self.partitions:
+            deleted += partition.delete_expired(now, limit - deleted)
+            if deleted >= limit:
+                break
+        return deleted
+
+    def snapshot(self, dest_path):
+        paths = [f'{dest_path}.p{i}' for i in range(len(self.partitions))]
+        list(self._executor.map(lambda args: args[0].snapshot(args[1]), zip(self.partitions, paths)))
+        with open(dest_path, 'w') as f:
+            json.dump({'partitions': len(self.partitions)}, f)
+
+    def restore(self, src_path):
+        partitions = snapshot_partitions(src_path)
+        if partitions != len(self.partitions):
+            # Snapshot con un numero diverso di partizioni (o non partizionato): i record vengono
+            # ridistribuiti secondo l'hash. È anche il modo per cambiare il numero di partizioni di un nodo.
+            super().restore(src_path)
+            return
+        paths = [f'{src_path}.p{i}' for i in range(partitions)]
+        list(self._executor.map(lambda args: args[0].restore(args[1]), zip(self.partitions, paths)))
+
+    def replace_records(self, rows):
+        groups = [[] for _ in self.partitions]
+        for row in rows:
+            groups[self._index(row[0])].append(row)
+        list(self._executor.map(lambda args: args[0].replace_records(args[1]), zip(self.partitions, groups)))
+
+    def close(self):
+        self._executor.shutdown()
+        for partition in self.partitions:
+            partition.close()
+
+
+# Motori disponibili, selezionabili tramite la chiave 'storage_engine' della configurazione.
+ENGINES = {
+    'sqlite': (SQLiteEngine, '.db'),
+    'log': (LogStructuredEngine, '.log'),
+    'memory': (MemoryEngine, ''),
+}
+
+
+def create_engine(kind, base_path, partitions=1):
+    """Crea il motore `kind` usando base_path (senza estensione) come percorso dei dati.
+
+    Con partitions > 1 le chiavi vengono suddivise tra più motori `kind` (PartitionedEngine).
+    """
+    if kind not in ENGINES:
+        raise ValueError(f"Unknown storage engine '{kind}'")
+    check_partitions(kind, base_path, partitions)
+    if partitions > 1:
+        return PartitionedEngine(kind, base_path, partitions)
+    engine_class, extension = ENGINES[kind]
+    return engine_class(base_path + extension)
+
+
+def check_partitions(kind, base_path, partitions):
+    """Verifica che i file già presenti su disco usino lo stesso numero di partizioni.
+
+    Il numero di partizioni è fisso una volta che il nodo contiene dati: con un
+    valore diverso le chiavi verrebbero cercate in altri file e i dati esistenti
+    diventerebbero invisibili. In quel caso solleva ValueError.
+    """
+    extension = ENGINES[kind][1]
+    if not extension:
+        return  # Motore in memoria: nessun file.
+    pattern = re.compile(re.escape(os.path.basename(base_path)) + r'_p(\d+)' + re.escape(extension) + '$')
+    found = {int(match.group(1)) for match in
+             (pattern.match(os.path.basename(path)) for path in glob.glob(f'{glob.escape(base_path)}_p*{extension}'))
+             if match}
+    single = os.path.exists(base_path + extension)  # Dati di un nodo non partizionato.
+    expected = set(range(partitions)) if partitions > 1 else set()
+    if (found and found != expected) or (single and partitions > 1):
+        raise ValueError(f'{base_path} has {len(found) or 1} partition(s) on disk but partitions={partitions}: '
+                         f'the number of partitions cannot change once a node has data')
+
+
+def snapshot_partitions(path):
+    """Restituisce il numero di partizioni di uno snapshot (0 se è un unico file SQLite)."""
+    with open(path, 'rb') as f:
+        if f.read(16).startswith(b'SQLite format 3'):
+            return 0
+        f.seek(0)
+        return json.load(f)['partitions']
+
+
+def snapshot_rows(path):
+    """Legge tutti i record (chiave, valore, versione, scadenza) di uno snapshot, partizionato o meno."""
+    partitions = snapshot_partitions(path)
+    rows = []
+    for part in [f'{path}.p{i}' for i in range(partitions)] if partitions else [path]:
+        conn = sqlite3.connect(part)
+        try:
+            rows.extend(conn.execute('''SELECT key, value, version, expires_at FROM kv_store''').fetchall())
+        finally:
+            conn.close()
+    return rows
+
+
+def snapshot_files(path):
+    """Restituisce tutti i file di uno snapshot (il file stesso più le eventuali partizioni)."""
+    return [path] + glob.glob(f'{glob.escape(path)}.p*')
@@ -0,0 +1,99 @@
+import contextvars
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+_current_trace = contextvars.ContextVar('trace', default=None)  # Trace della richiesta in corso.
+
+
+class Trace:
+    """Span registrati durante una singola richiesta.
+
+    Ogni span è (nome, inizio, durata, attributi) con l'inizio relativo
+    all'inizio della richiesta; gli span possono arrivare da più thread (letture
+    in quorum), quindi l'aggiunta è protetta da un lock.
+    """
+
+    def __init__(self, request_id, name, sampled=True):
+        self.request_id = request_id
+        self.name = name
+        self.sampled = sampled  # Solo le richieste campionate registrano gli span.
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, duration, attrs):
+        with self._lock:
+            self.spans.append((name, start - self.start, duration, attrs))
+
+    def to_dict(self):
+        return {
+            'request_id': self.request_id,
+            'name': self.name,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'spans': [{'name': name, 'start_ms': round(start * 1000, 3), 'duration_ms': round(duration * 1000, 3),
+                       **attrs} for name, start, duration, attrs in sorted(self.spans, key=lambda span: span[1])],
+        }
+
+
+def current_request_id():
+    """Restituisce l'ID della richiesta in corso nel contesto corrente, oppure None."""
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+@contextmanager
+def _record(trace, name, attrs):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter() - start, attrs)
+
+
+def span(name, **attrs):
+    """Misura il blocco come span della richiesta in corso; senza una richiesta campionata non fa nulla."""
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled:
+        return nullcontext()
+    return _record(trace, name, attrs)
+
+
+def bind_context(function):
+    """Restituisce una funzione che esegue `function` nel contesto corrente (per i thread pool)."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(function, *args, **kwargs)
+
+
+class Tracer:
+    """Crea una trace per ogni richiesta e tiene un log delle richieste lente.
+
+    Una frazione `sample_rate` delle richieste registra gli span; tra queste,
+    quelle che durano almeno `slow_threshold` secondi finiscono nel log delle
+    richieste lente (le ultime `max_slow`). L'ID della richiesta è sempre
+    disponibile tramite current_request_id(), anche se non campionata.
+    """
+
+    def __init__(self, sample_rate=1.0, slow_threshold=0.5, max_slow=100, seed=None):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold  # Durata (secondi) oltre cui una richiesta è considerata lenta.
+        self.slow_requests = deque(maxlen=max_slow)
+        self._random = random.Random(seed)
+
+    @contextmanager
+    def trace(self, name, request_id=None):
+        """Esegue il blocco come richiesta `name`, con l'ID dato o uno nuovo."""
+        trace = Trace(request_id or uuid.uuid4().hex, name, self._random.random() < self.sample_rate)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace.duration = time.perf_counter() - trace.start
+            if trace.sampled and trace.duration >= self.slow_threshold:
+                self.slow_requests.append(trace.to_dict())
+                print(f"Slow request {trace.request_id} {name}: {trace.duration * 1000:.1f} ms")
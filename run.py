@@ -1,6 +1,10 @@
+import atexit
 import json
 import os
+import signal
 import sys
+from flask import Flask
+from werkzeug.serving import is_running_from_reloader
 from app import create_app
 import unittest
 
@@ -11,6 +15,19 @@ def load_config(file_path, default_config=None):
             "host": "127.0.0.1",  # Default host
             "port": 5000,  # Default port
             "nodes_db": 3,  # Default fattore di replica
+            "storage_engine": "sqlite",  # Default motore di storage ('sqlite', 'log', 'memory')
+            "partitions": 1,  # Default numero di partizioni (file) dello storage di ogni nodo
+            "read_policy": "power_of_two",  # Default politica di lettura ('first', 'round_robin', 'power_of_two', 'latency_ewma')
+            "read_quorum": 1,  # Default numero di repliche consultate per ogni lettura
+            "failure_detector": {"enabled": False},  # Default failure detector automatico disattivato
+            "expiry_reaper": {"enabled": True},  # Default eliminazione in background delle chiavi scadute
+            "write_quorum": 1,  # Default nodi scritti in modo sincrono con la strategia 'async'
+            "recovery_mode": "sync",  # Default recupero dei nodi ('sync' riga per riga, 'snapshot' da un peer)
+            "admission": None,  # Default nessun limite di concorrenza o rate limit sulle richieste API
+            "node_limits": None,  # Default nessuna coda di lavoro limitata sui nodi
+            "tracing": {"sample_rate": 1.0, "slow_threshold": 0.5},  # Default trace di tutte le richieste, lente oltre 0.5 s
+            "startup": "parallel",  # Default avvio dei nodi ('parallel' attende tutti i nodi, 'background' serve i nodi già pronti)
+            "stream_chunk_size": 262144,  # Default dimensione (byte) dei chunk dei valori in streaming
             "API_TOKEN": "your_api_token_here"  # Default API token 
         }
     
@@ -46,10 +63,18 @@ if __name__ == '__main__':
     host = config.get('host')
     port = config.get('port')
 
-    # Crea l'app Flask
-    app = create_app(config)
-
     if 'test' in sys.argv:
         unittest.main(argv=['first-arg-is-ignored'], exit=False)
+    elif not is_running_from_reloader():
+        # Processo padre del reloader (debug=True): non serve richieste, riavvia solo il processo figlio quando
+        # il codice cambia. Non apre i nodi: un secondo ReplicationManager sugli stessi file ne cancellerebbe
+        # i file di hint e scriverebbe negli stessi log del processo che serve le richieste.
+        Flask(__name__).run(debug=True, host=host, port=port)
     else:
+        # Crea l'app Flask
+        app = create_app(config)
+        # Allo spegnimento (Ctrl+C, SIGTERM, riavvio del reloader) chiude i nodi: ferma i thread in background
+        # e salva gli indici del motore 'log', così il riavvio successivo non deve rileggere tutto il log.
+        atexit.register(app.extensions['replication_manager'].close)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
         app.run(debug=True, host=host, port=port)
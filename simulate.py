@@ -0,0 +1,28 @@
+import argparse
+from app.simulator import ClusterSimulator
+
+# Script per simulare sequenze deterministiche di guasti e recuperi su un cluster di grandi dimensioni.
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simula fallimenti, recuperi, aggiunte e rimozioni di nodi.')
+    parser.add_argument('--nodes', type=int, default=100, help='Numero iniziale di nodi')
+    parser.add_argument('--keys', type=int, default=100000, help='Numero di chiavi caricate')
+    parser.add_argument('--events', type=int, default=20, help='Numero di eventi da simulare')
+    parser.add_argument('--strategy', choices=['consistent', 'full'], default='consistent', help='Strategia di replica')
+    parser.add_argument('--replication-factor', type=int, default=3, help='Fattore di replica (consistent)')
+    parser.add_argument('--seed', type=int, default=0, help='Seme della sequenza di eventi')
+    parser.add_argument('--sample-size', type=int, default=1000, help='Chiavi controllate per la disponibilità')
+    args = parser.parse_args()
+
+    simulator = ClusterSimulator(nodes=args.nodes, keys=args.keys, strategy=args.strategy,
+                                 replication_factor=args.replication_factor, seed=args.seed,
+                                 sample_size=args.sample_size)
+    try:
+        print(f"{'#':>3} {'event':<8} {'node':>5} {'moved':>10} {'time ms':>10} {'unavailable':>12} {'imbalance':>10}")
+        simulator.load()
+        for i in range(args.events):
+            result = simulator.step()
+            print(f"{i + 1:>3} {result['event']:<8} {result['node_id']:>5} {result['data_moved']:>10} "
+                  f"{result['duration_ms']:>10.1f} {result['unavailable_keys']:>12} {result['imbalance']:>10.3f}")
+        print(simulator.summary())
+    finally:
+        simulator.close()
@@ -0,0 +1,90 @@
+import os
+import sys
+import threading
+import unittest
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.admission import ConcurrencyLimiter, Overloaded, TokenBucket
+from app.models import ReplicationManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# Test del controllo di ammissione e delle code limitate dei nodi
+class TestAdmission(unittest.TestCase):
+
+    def test_token_bucket_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=2, clock=clock)
+        self.assertEqual(bucket.try_acquire(), 0.0)
+        self.assertEqual(bucket.try_acquire(), 0.0)
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+        clock.now = 0.5
+        self.assertEqual(bucket.try_acquire(), 0.0)
+
+    def test_limiter_rejects_when_queue_is_full(self):
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, queue_timeout=5)
+        self.assertTrue(limiter.acquire())
+        admitted = []
+        waiter = threading.Thread(target=lambda: admitted.append(limiter.acquire()))
+        waiter.start()
+        while limiter.waiting == 0:
+            pass
+        self.assertFalse(limiter.acquire())  # Coda piena: rifiutata subito.
+        limiter.release()
+        waiter.join()
+        self.assertEqual(admitted, [True])
+        self.assertEqual(limiter.get_status()['rejected'], 1)
+
+    def test_saturated_node_rejects_write_without_partial_writes(self):
+        manager = ReplicationManager(nodes_db=3, strategy='full', storage_engine='memory', read_policy='first',
+                                     node_limits={'max_concurrent': 1, 'max_queue': 0})
+        manager.write_to_replicas('key', 'value')
+        with manager.nodes[2].work_slot():
+            with self.assertRaises(Overloaded):
+                manager.write_to_replicas('other', 'value')
+            self.assertFalse(manager.key_exists_in_replicas('other'))
+            # Le letture saltano il nodo saturo.
+            with manager.nodes[0].work_slot():
+                self.assertEqual(manager.read_from_replicas('key')['value'], 'value')
+        manager.close()
+
+    def test_api_returns_429_with_retry_after(self):
+        app = create_app({'nodes_db': 3, 'port': 5000, 'API_TOKEN': 'token', 'storage_engine': 'memory',
+                          'admission': {'max_concurrent': 4, 'rate': 1, 'burst': 1}})
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer token'}
+        self.assertEqual(client.post('/write', json={'key': 'key', 'value': 'value'}, headers=headers).status_code,
+                         200)
+        response = client.get('/read/key', headers=headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        # La readiness non richiede il token e non è soggetta al rate limit.
+        self.assertEqual(client.get('/ready').status_code, 200)
+
+    def test_streamed_download_holds_its_slot(self):
+        app = create_app({'nodes_db': 3, 'port': 5000, 'API_TOKEN': 'token', 'storage_engine': 'memory',
+                          'admission': {'max_concurrent': 1, 'max_queue': 0}})
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer token'}
+        client.put('/stream/blob?chunk_size=4', data=b'0123456789', headers=headers)
+        download = client.get('/stream/blob', headers=headers, buffered=False)
+        self.assertEqual(download.status_code, 200)
+        # Finché il download non è terminato il suo posto resta occupato.
+        self.assertEqual(client.get('/read/blob', headers=headers).status_code, 429)
+        self.assertEqual(b''.join(download.response), b'0123456789')
+        download.close()
+        self.assertEqual(client.get('/read/blob', headers=headers).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
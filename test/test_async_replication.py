@@ -0,0 +1,111 @@
+import os
+import sys
+import threading
+import unittest
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.models import QuorumUnavailable, ReplicationManager
+
+
+# Test della strategia di replica asincrona primario-backup
+class TestAsyncReplication(unittest.TestCase):
+
+    def setUp(self):
+        self.replication_manager = ReplicationManager(nodes_db=3, strategy='async', storage_engine='memory',
+                                                      replication_log={'interval': 0.01})
+        self.log = self.replication_manager.replication_log
+
+    def tearDown(self):
+        self.replication_manager.close()
+
+    def test_write_acknowledged_by_primary_then_shipped(self):
+        manager = self.replication_manager
+        self.log.stop()  # Ferma l'invio in background per osservare le code.
+        manager.write_to_replicas('key', 'value')
+        primary = manager.consistent_hash.get_node('key')
+        self.assertEqual(primary.read('key'), 'value')
+        followers = [node for node in manager.nodes if node is not primary]
+        self.assertTrue(all(node.read('key') is None for node in followers))
+        self.assertEqual([self.log.get_status(node.node_id)['pending'] for node in followers], [1, 1])
+
+        self.assertEqual(self.log.ship(), 2)
+        self.assertTrue(all(node.read('key') == 'value' for node in manager.nodes))
+        self.assertEqual(manager.get_nodes_status()[followers[0].node_id]['replication']['pending'], 0)
+
+    def test_delete_is_ordered_after_queued_writes(self):
+        manager = self.replication_manager
+        self.log.stop()
+        manager.write_to_replicas('key', 'value')
+        manager.delete_from_replicas('key')
+        self.log.ship()
+        self.assertTrue(all(node.read('key') is None for node in manager.nodes))
+
+    def test_shipping_does_not_hold_client_key_locks(self):
+        manager = self.replication_manager
+        self.log.stop()
+        for i in range(10):
+            manager.write_to_replicas(f'key_{i}', f'value_{i}')
+        # Una scrittura in corso su una delle chiavi non blocca l'invio del batch ai follower.
+        with manager.key_locks.lock('key_3'):
+            shipper = threading.Thread(target=self.log.ship)
+            shipper.start()
+            shipper.join(5)
+            self.assertFalse(shipper.is_alive())
+        self.assertTrue(all(node.read('key_3') == 'value_3' for node in manager.nodes))
+
+    def test_background_shipping_and_write_quorum(self):
+        manager = self.replication_manager
+        manager.write_quorum = 2
+        for i in range(50):
+            manager.write_to_replicas(f'key_{i}', f'value_{i}')
+        self.assertEqual(manager.increment('counter'), 1)
+        self.assertTrue(self.log.flush())
+        for node in manager.nodes:
+            self.assertEqual(len(node.get_all_keys()), 51)
+
+    def test_write_rejected_without_write_quorum(self):
+        manager = self.replication_manager
+        manager.write_quorum = 2
+        manager.fail_node(1)
+        manager.write_to_replicas('key', 'value')  # Due nodi attivi bastano ancora.
+        manager.fail_node(2)
+        for write in (lambda: manager.write_to_replicas('other', 'value'), lambda: manager.increment('counter'),
+                      lambda: manager.delete_from_replicas('key')):
+            with self.assertRaises(QuorumUnavailable):
+                write()
+        self.assertIsNone(manager.nodes[0].read('other'))
+        self.assertEqual(manager.nodes[0].read('key'), 'value')
+
+        # Anche senza alcun nodo attivo la scrittura non viene confermata.
+        manager.write_quorum = 1
+        manager.fail_node(0)
+        with self.assertRaises(QuorumUnavailable):
+            manager.write_to_replicas('other', 'value')
+
+    def test_api_returns_503_without_write_quorum(self):
+        app = create_app({'nodes_db': 3, 'port': 5000, 'API_TOKEN': 'token', 'storage_engine': 'memory',
+                          'write_quorum': 3})
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer token'}
+        client.post('/set_replication_strategy', json={'strategy': 'async'}, headers=headers)
+        self.assertEqual(client.post('/write', json={'key': 'a', 'value': 'x'}, headers=headers).status_code, 200)
+        client.post('/fail/2', headers=headers)
+        response = client.post('/write', json={'key': 'b', 'value': 'x'}, headers=headers)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(client.post('/incr', json={'key': 'c'}, headers=headers).status_code, 503)
+
+    def test_recovered_follower_catches_up(self):
+        manager = self.replication_manager
+        manager.fail_node(2)
+        manager.write_to_replicas('during', 'value')
+        manager.recover_node(2)
+        self.assertTrue(self.log.flush())
+        self.assertEqual(manager.nodes[2].read('during'), 'value')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+import unittest
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.models import ReplicationManager
+
+
+# Test delle operazioni atomiche compare-and-set e incremento
+class TestAtomicOperations(unittest.TestCase):
+
+    def setUp(self):
+        self.replication_manager = ReplicationManager(nodes_db=3, strategy='full', storage_engine='memory')
+
+    def tearDown(self):
+        self.replication_manager.close()
+
+    def test_compare_and_set(self):
+        manager = self.replication_manager
+        self.assertTrue(manager.compare_and_set('key', 'value_1', expected=None)['success'])
+        self.assertFalse(manager.compare_and_set('key', 'value_2', expected=None)['success'])
+        result = manager.compare_and_set('key', 'value_2', expected='value_1')
+        self.assertTrue(result['success'])
+        stale = manager.compare_and_set('key', 'value_3', expected_version=result['version'] - 1)
+        self.assertEqual((stale['success'], stale['value']), (False, 'value_2'))
+        self.assertTrue(manager.compare_and_set('key', 'value_3', expected_version=result['version'])['success'])
+        self.assertEqual([node.read('key') for node in manager.nodes], ['value_3'] * 3)
+
+    def test_concurrent_increments(self):
+        def worker():
+            for _ in range(50):
+                self.replication_manager.increment('counter')
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.replication_manager.increment('counter', 0), 200)
+        self.assertEqual([int(node.read('counter')) for node in self.replication_manager.nodes], [200] * 3)
+
+    def test_increment_batch_and_errors(self):
+        manager = self.replication_manager
+        manager.write_to_replicas('text', 'abc')
+        results = manager.increment_many([{'key': 'a', 'delta': 5}, {'key': 'a', 'delta': -2}, {'key': 'text'}])
+        self.assertEqual([result.get('value') for result in results], [5, 3, None])
+        self.assertIn('error', results[2])
+        with self.assertRaises(ValueError):
+            manager.increment('text')
+
+    def test_api(self):
+        app = create_app({'nodes_db': 3, 'port': 5000, 'API_TOKEN': 'token', 'storage_engine': 'memory'})
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer token'}
+        self.assertEqual(client.post('/incr', json={'key': 'hits', 'delta': 2}, headers=headers).json['value'], 2)
+        response = client.post('/cas', json={'key': 'hits', 'value': 10, 'expected': 3}, headers=headers)
+        self.assertEqual((response.status_code, response.json['value']), (409, '2'))
+        response = client.post('/cas', json={'key': 'hits', 'value': 10, 'expected': 2}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        response = client.post('/incr_batch', json={'operations': [{'key': 'hits'}, {'key': 'misses'}]},
+                               headers=headers)
+        self.assertEqual([result['value'] for result in response.json['results']], [11, 1])
+        self.assertEqual(client.post('/cas', json={'key': 'hits', 'value': 1}, headers=headers).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.locks import ReadWriteLock, StripedLock
+from app.models import ReplicationManager
+
+
+# Stress test: scritture concorrenti mentre i nodi falliscono e vengono recuperati
+class TestConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes_db = 3
+        self.writers = 4
+        self.keys_per_writer = 50
+        self.db_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.db_dir, ignore_errors=True)
+
+    def _stress(self, strategy):
+        replication_manager = ReplicationManager(nodes_db=self.nodes_db, strategy=strategy, replication_factor=2,
+                                                 db_dir=self.db_dir)
+        errors = []
+        done = threading.Event()
+
+        def writer(writer_id):
+            try:
+                for i in range(self.keys_per_writer):
+                    key = f'{strategy}_{writer_id}_{i}'
+                    self.assertTrue(replication_manager.write_if_absent(key, f'value_{i}'))
+            except Exception as e:
+                errors.append(e)
+
+        def chaos():
+            try:
+                node_id = 0
+                while not done.is_set():
+                    replication_manager.fail_node(node_id)
+                    replication_manager.recover_node(node_id)
+                    node_id = (node_id + 1) % self.nodes_db
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(self.writers)]
+        chaos_thread = threading.Thread(target=chaos)
+        chaos_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        chaos_thread.join()
+
+        self.assertEqual(errors, [])
+        for writer_id in range(self.writers):
+            for i in range(self.keys_per_writer):
+                result = replication_manager.read_from_replicas(f'{strategy}_{writer_id}_{i}')
+                self.assertEqual(result['value'], f'value_{i}')
+        replication_manager.close()
+
+    def test_writes_during_fail_recover_full(self):
+        self._stress('full')
+
+    def test_writes_during_fail_recover_consistent(self):
+        self._stress('consistent')
+
+    def test_write_if_absent_is_atomic(self):
+        replication_manager = ReplicationManager(nodes_db=self.nodes_db, storage_engine='memory')
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(replication_manager.write_if_absent('key', 'v')))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+
+    def test_lock_primitives(self):
+        striped = StripedLock(stripes=4)
+        with striped.lock_many(['a', 'b', 'c', 'a']):
+            self.assertTrue(striped.lock('a').locked())
+        self.assertFalse(striped.lock('a').locked())
+
+        rw_lock = ReadWriteLock()
+        readers_inside = threading.Barrier(2, timeout=5)
+
+        def reader():
+            with rw_lock.read_lock():
+                readers_inside.wait()  # Entrambi i lettori devono essere dentro insieme.
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join()
+        with rw_lock.write_lock():
+            pass
+
+
+if __name__ == '__main__':
+    unittest.main()
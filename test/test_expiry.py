@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import unittest
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.expiry import ExpiryReaper
+from app.models import ReplicationManager
+
+
+# Test della scadenza delle chiavi su tutte le repliche
+class TestExpiry(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes_db = 3
+        self.replication_manager = ReplicationManager(nodes_db=self.nodes_db, strategy='full',
+                                                      storage_engine='memory')
+
+    def test_ttl_is_identical_on_every_replica(self):
+        self.replication_manager.write_to_replicas('session', 'data', ttl=60)
+        expiries = {node.read_record('session')[2] for node in self.replication_manager.nodes}
+        self.assertEqual(len(expiries), 1)
+        self.assertAlmostEqual(expiries.pop(), time.time() + 60, delta=5)
+
+    def test_reaper_deletes_expired_keys_on_all_nodes(self):
+        for i in range(10):
+            self.replication_manager.write_to_replicas(f'session_{i}', 'data', ttl=30)
+        self.replication_manager.write_to_replicas('permanent', 'data')
+        reaper = ExpiryReaper(self.replication_manager, batch_size=4, max_batches=10)
+
+        self.assertEqual(reaper.reap(), 0)
+        self.assertEqual(reaper.reap(now=time.time() + 60), 10 * self.nodes_db)
+        for node in self.replication_manager.nodes:
+            self.assertEqual(node.get_all_keys(), [('permanent', 'data')])
+
+    def test_expired_key_can_be_written_again(self):
+        self.replication_manager.write_to_replicas('session', 'old', ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.replication_manager.read_from_replicas('session')['value'])
+        self.assertTrue(self.replication_manager.write_if_absent('session', 'new'))
+        self.assertEqual(self.replication_manager.read_from_replicas('session')['value'], 'new')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import unittest
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.failure_detector import FailureDetector, PhiAccrualEstimator
+from app.models import ReplicationManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# Test del failure detector basato su heartbeat
+class TestFailureDetector(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes_db = 3
+        self.clock = FakeClock()
+        self.replication_manager = ReplicationManager(nodes_db=self.nodes_db, strategy='full',
+                                                      storage_engine='memory')
+        self.detector = FailureDetector(self.replication_manager, interval=1.0, timeout=0.2, slow_latency=0.05,
+                                        clock=self.clock)
+
+    def tearDown(self):
+        self.detector.stop()
+
+    def _ticks(self, count):
+        for _ in range(count):
+            self.clock.now += 1.0
+            self.detector.tick()
+
+    def test_phi_grows_with_silence(self):
+        estimator = PhiAccrualEstimator(min_std=0.25)
+        for t in range(10):
+            estimator.heartbeat(float(t))
+        self.assertLess(estimator.phi(9.5), 1.0)
+        self.assertGreater(estimator.phi(12.0), estimator.phi(10.5))
+
+    def test_unreachable_node_is_failed_and_recovered(self):
+        self._ticks(5)
+        node = self.replication_manager.nodes[1]
+        node.inject_fault(reachable=False)
+        self._ticks(2)
+        self.assertEqual(self.detector.states[1], 'suspect')
+        self._ticks(1)
+        self.assertEqual(self.detector.states[1], 'dead')
+        self.assertFalse(node.is_alive())
+
+        # Una scrittura persa durante il guasto viene recuperata dalla sincronizzazione automatica.
+        self.replication_manager.write_to_replicas('key', 'value')
+        node.inject_fault(reachable=True)
+        self._ticks(1)
+        self.assertTrue(node.is_alive())
+        self.assertEqual(self.detector.states[1], 'alive')
+        self.assertEqual(node.read('key'), 'value')
+
+    def test_manually_failed_node_is_not_recovered(self):
+        self._ticks(3)
+        self.replication_manager.fail_node(2)
+        self._ticks(3)
+        self.assertFalse(self.replication_manager.nodes[2].is_alive())
+
+    def test_slow_node_is_suspect_and_avoided(self):
+        self.replication_manager.write_to_replicas('key', 'value')
+        slow_node = self.replication_manager.nodes[0]
+        slow_node.inject_fault(delay=0.1)
+        self._ticks(3)
+        self.assertEqual(self.detector.states[0], 'suspect')
+        self.assertTrue(slow_node.is_alive())
+        reads_before = slow_node.reads
+        for _ in range(5):
+            self.assertEqual(self.replication_manager.read_from_replicas('key')['value'], 'value')
+        self.assertEqual(slow_node.reads, reads_before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import os
 import sys
+import shutil
+import tempfile
 import unittest
 import time
 
@@ -123,5 +125,39 @@ class TestPerformanceConsistent(unittest.TestCase):
             print(f'{test}: {duration:.4f} seconds')
 
 
+# Confronto dei motori di storage sullo stesso carico
+class TestPerformanceEngines(unittest.TestCase):
+    results = {}
+
+    def setUp(self):
+        self.range_to_test = 200
+        self.nodes_db = 3
+        self.db_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.db_dir, ignore_errors=True)
+
+    def test_engines_side_by_side(self):
+        for engine in ('sqlite', 'log', 'memory'):
+            replication_manager = ReplicationManager(nodes_db=self.nodes_db, strategy='full',
+                                                     storage_engine=engine, db_dir=self.db_dir)
+            start_time = time.time()
+            for i in range(self.range_to_test):
+                replication_manager.write_to_replicas(f'key_{i}', f'value_{i}')
+            TestPerformanceEngines.results[f'Write performance ({engine})'] = time.time() - start_time
+
+            start_time = time.time()
+            for i in range(self.range_to_test):
+                self.assertEqual(replication_manager.read_from_replicas(f'key_{i}')['value'], f'value_{i}')
+            TestPerformanceEngines.results[f'Read performance ({engine})'] = time.time() - start_time
+            replication_manager.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        print("\n\n--- Performance Results Storage Engines ---")
+        for test, duration in cls.results.items():
+            print(f'{test}: {duration:.4f} seconds')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import unittest
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models import ReplicationManager
+
+
+# Test delle letture a quorum e del read repair
+class TestQuorumRead(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes_db = 3
+        self.replication_manager = ReplicationManager(nodes_db=self.nodes_db, strategy='full',
+                                                      storage_engine='memory', read_quorum=3)
+
+    def tearDown(self):
+        self.replication_manager.close()
+
+    def test_newest_version_wins(self):
+        self.replication_manager.write_to_replicas('key', 'old')
+        nodes = self.replication_manager.nodes
+        version = nodes[0].read_record('key')[1]
+        nodes[1].write('key', 'new', version + 1)  # Solo una replica ha ricevuto l'aggiornamento.
+        result = self.replication_manager.read_from_replicas('key')
+        self.assertEqual(result['value'], 'new')
+        self.assertEqual(result['version'], version + 1)
+
+    def test_stale_replicas_are_repaired(self):
+        # Il nodo 2 era fallito durante la scrittura e non ha la chiave.
+        self.replication_manager.fail_node(2)
+        self.replication_manager.write_to_replicas('key', 'value')
+        self.replication_manager.nodes[2].alive = True
+        self.assertIsNone(self.replication_manager.nodes[2].read('key'))
+
+        self.assertEqual(self.replication_manager.read_from_replicas('key')['value'], 'value')
+        self.replication_manager.repair_executor.submit(lambda: None).result()  # Attende le riparazioni in coda.
+        self.assertEqual(self.replication_manager.nodes[2].read('key'), 'value')
+        self.assertEqual(self.replication_manager.read_repairs, 1)
+
+    def test_deleted_key_is_not_resurrected(self):
+        # Una replica fallita durante la cancellazione conserva la chiave: al recupero il tombstone delle
+        # altre repliche deve vincere e il read repair deve propagare la cancellazione, non il valore.
+        manager = ReplicationManager(nodes_db=3, strategy='consistent', replication_factor=2,
+                                     storage_engine='memory', read_quorum=2)
+        try:
+            manager.write_to_replicas('k', 'v')
+            owners = manager.consistent_hash.get_nodes_for_key('k')
+            manager.fail_node(owners[1].node_id)
+            manager.delete_from_replicas('k')
+            manager.recover_node(owners[1].node_id)
+
+            self.assertIsNone(manager.read_from_replicas('k')['value'])
+            manager.repair_executor.submit(lambda: None).result()  # Attende le riparazioni in coda.
+            self.assertEqual([node.read('k') for node in manager.nodes], [None] * 3)
+            self.assertIsNone(manager.read_from_replicas('k')['value'])
+        finally:
+            manager.close()
+
+    def test_quorum_read_falls_back_to_hinted_node(self):
+        # Con entrambe le repliche dell'anello fallite la chiave resta solo sul nodo che la ospita temporaneamente.
+        manager = ReplicationManager(nodes_db=3, strategy='consistent', replication_factor=2,
+                                     storage_engine='memory', read_quorum=2)
+        try:
+            manager.write_to_replicas('k', 'v')
+            owners = manager.consistent_hash.get_nodes_for_key('k')
+            for owner in owners:
+                manager.fail_node(owner.node_id)
+            self.assertIn('k', manager.consistent_hash.temp_key_storage)
+            self.assertEqual(manager.read_from_replicas('k')['value'], 'v')
+        finally:
+            manager.close()
+
+    def test_delete_has_one_version_on_every_replica(self):
+        manager = self.replication_manager
+        manager.write_to_replicas('key', 'value')
+        manager.delete_from_replicas('key')
+        versions = {node.read_version('key')[1] for node in manager.nodes}
+        self.assertEqual(len(versions), 1)
+        # Le repliche concordano: la lettura in quorum non ha nulla da riparare.
+        self.assertIsNone(manager.read_from_replicas('key')['value'])
+        manager.repair_executor.submit(lambda: None).result()
+        self.assertEqual(manager.read_repairs, 0)
+
+    def test_repair_does_not_overwrite_newer_write(self):
+        node = self.replication_manager.nodes[0]
+        node.write('key', 'newer', 10)
+        self.assertFalse(node.write_if_newer('key', 'older', 5))
+        self.assertEqual(node.read('key'), 'newer')
+
+
+if __name__ == '__main__':
+    unittest.main()
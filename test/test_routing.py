@@ -0,0 +1,48 @@
+import os
+import sys
+import unittest
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models import ReplicationManager
+from app.routing import PowerOfTwoRouter
+
+
+# Test dell'instradamento delle letture tra le repliche
+class TestReadRouting(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes_db = 3
+        self.replication_manager = ReplicationManager(nodes_db=self.nodes_db, strategy='full',
+                                                      storage_engine='memory', read_policy='round_robin')
+        self.replication_manager.write_to_replicas('key', 'value')
+
+    def test_round_robin_spreads_reads(self):
+        for _ in range(30):
+            self.assertEqual(self.replication_manager.read_from_replicas('key')['value'], 'value')
+        self.assertEqual([node.reads for node in self.replication_manager.nodes], [10, 10, 10])
+
+    def test_failed_nodes_are_skipped(self):
+        self.replication_manager.fail_node(0)
+        for _ in range(10):
+            self.assertEqual(self.replication_manager.read_from_replicas('key')['value'], 'value')
+        self.assertEqual(self.replication_manager.nodes[0].reads, 0)
+
+    def test_power_of_two_prefers_idle_node(self):
+        busy, idle = self.replication_manager.nodes[:2]
+        busy.in_flight = 5
+        router = PowerOfTwoRouter(seed=1)
+        for _ in range(10):
+            self.assertIs(router.order([busy, idle])[0], idle)
+
+    def test_nodes_status_reports_load(self):
+        self.replication_manager.set_read_policy('latency_ewma')
+        self.replication_manager.read_from_replicas('key')
+        status = self.replication_manager.get_nodes_status()
+        self.assertEqual(sum(node['reads'] for node in status), 1)
+        self.assertTrue(all('in_flight' in node and 'latency_ewma_ms' in node for node in status))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.simulator import ClusterSimulator
+
+
+# Test del simulatore deterministico di guasti e recuperi
+class TestClusterSimulator(unittest.TestCase):
+
+    def simulate(self, strategy, seed):
+        simulator = ClusterSimulator(nodes=8, keys=500, strategy=strategy, replication_factor=2, seed=seed,
+                                     sample_size=100)
+        try:
+            results = simulator.run(events=8)
+            return results, simulator.summary()
+        finally:
+            simulator.close()
+
+    def test_same_seed_same_events(self):
+        for strategy in ('consistent', 'full'):
+            with self.subTest(strategy=strategy):
+                first, summary = self.simulate(strategy, seed=7)
+                second, _ = self.simulate(strategy, seed=7)
+                strip = lambda results: [{k: v for k, v in r.items() if k != 'duration_ms'} for r in results]
+                self.assertEqual(strip(first), strip(second))
+                self.assertEqual(summary['events'], 8)
+                self.assertGreater(summary['data_moved'], 0)
+
+    def test_full_replication_keeps_keys_available(self):
+        results, _ = self.simulate('full', seed=3)
+        self.assertTrue(all(result['unavailable_keys'] == 0 for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models import ReplicaNode, ReplicationManager
+from app.storage import create_engine
+
+
+# Test degli snapshot online, del ripristino e del bootstrap dei nodi
+class TestSnapshots(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_snapshot_restore_round_trip(self):
+        for kind in ('sqlite', 'log', 'memory'):
+            with self.subTest(engine=kind):
+                engine = create_engine(kind, os.path.join(self.tmp_dir, f'source_{kind}'))
+                engine.write('key_1', 'value_1', 3)
+                engine.write('key_2', 'value_2', 4, 4102444800.0)
+                snapshot_path = os.path.join(self.tmp_dir, f'snapshot_{kind}.db')
+                engine.snapshot(snapshot_path)
+                engine.write('key_3', 'after_snapshot', 5)
+
+                target = create_engine(kind, os.path.join(self.tmp_dir, f'target_{kind}'))
+                target.write('stale', 'value')
+                target.restore(snapshot_path)
+                self.assertEqual(sorted(target.records()), [('key_1', 'value_1', 3, None),
+                                                            ('key_2', 'value_2', 4, 4102444800.0)])
+                engine.close()
+                target.close()
+
+    def test_bootstrap_replays_changes_after_snapshot(self):
+        peer = ReplicaNode(0, 5000, 'sqlite', self.tmp_dir)
+        node = ReplicaNode(1, 5001, 'sqlite', self.tmp_dir)
+        peer.write('kept', 'value', 1)
+        peer.write('deleted', 'value', 1)
+        take_snapshot = peer.snapshot
+
+        def snapshot_then_write(dest_path):
+            # Simula scritture concorrenti arrivate dopo la copia dello snapshot.
+            seq = take_snapshot(dest_path)
+            peer.write('new', 'value', 2)
+            peer.delete('deleted')
+            return seq
+
+        peer.snapshot = snapshot_then_write
+        self.assertTrue(node.bootstrap_from(peer, os.path.join(self.tmp_dir, 'bootstrap.db')))
+        self.assertEqual(sorted(key for key, _ in node.get_all_keys()), ['kept', 'new'])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'bootstrap.db')))
+        peer.close()
+        node.close()
+
+    def test_truncated_change_log_requires_full_sync(self):
+        peer = ReplicaNode(0, 5000, 'memory', self.tmp_dir, change_log_size=2)
+        for i in range(5):
+            peer.write(f'key_{i}', 'value')
+        self.assertIsNone(peer.changes_since(0))
+        self.assertEqual(len(peer.changes_since(4)), 1)
+        peer.close()
+
+    def test_change_log_keeps_only_write_references(self):
+        peer = ReplicaNode(0, 5000, 'memory', self.tmp_dir)
+        for i in range(20):
+            peer.write(f'key_{i % 5}', 'x' * 100000, i + 1)
+        # Il log non trattiene i valori scritti...
+        self.assertTrue(all(change[3] is None for change in peer.change_log))
+        # ...che vengono riletti dallo storage; le scritture già sostituite vengono scartate.
+        self.assertEqual(sorted((change[2], change[4]) for change in peer.changes_since(0)),
+                         [(f'key_{i}', 16 + i) for i in range(5)])
+        self.assertTrue(all(change[3] == 'x' * 100000 for change in peer.changes_since(0)))
+        peer.close()
+
+    def test_bootstrap_refused_with_consistent_hashing(self):
+        manager = ReplicationManager(nodes_db=3, strategy='consistent', replication_factor=2,
+                                     storage_engine='memory', db_dir=self.tmp_dir)
+        for i in range(20):
+            manager.write_to_replicas(f'key_{i}', 'value')
+        keys = manager.nodes[1].get_all_keys()
+        with self.assertRaises(RuntimeError):
+            manager.bootstrap_node(1, source_id=0)
+        self.assertEqual(manager.nodes[1].get_all_keys(), keys)
+        manager.close()
+
+    def test_recovery_from_snapshot(self):
+        manager = ReplicationManager(nodes_db=3, strategy='full', storage_engine='sqlite', db_dir=self.tmp_dir,
+                                     recovery_mode='snapshot')
+        manager.write_to_replicas('before', 'value')
+        manager.fail_node(2)
+        manager.write_to_replicas('during', 'value')
+        manager.delete_from_replicas('before')
+        manager.recover_node(2)
+        self.assertEqual(manager.nodes[2].get_all_keys(), [('during', 'value')])
+
+        snapshot = manager.snapshot_node(0)
+        manager.write_to_replicas('later', 'value')
+        manager.restore_node(1, snapshot['snapshot'])
+        self.assertEqual(manager.nodes[1].get_all_keys(), [('during', 'value')])
+        self.assertEqual(manager.bootstrap_node(1, source_id=0), 'snapshot')
+        self.assertEqual(sorted(key for key, _ in manager.nodes[1].get_all_keys()), ['during', 'later'])
+        with self.assertRaises(FileNotFoundError):
+            manager.restore_node(1, 'missing.db')
+        manager.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
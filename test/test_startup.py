@@ -0,0 +1,121 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.models import ReplicaNode, ReplicationManager
+
+
+# Test dell'avvio parallelo e in background dei nodi
+class TestStartup(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.release = threading.Event()
+        original_open = ReplicaNode.open
+        release = self.release
+
+        # Il nodo 2 resta in avvio finché il test non lo sblocca.
+        def slow_open(node):
+            if node.node_id == 2:
+                release.wait(5)
+            original_open(node)
+
+        self.patcher = mock.patch.object(ReplicaNode, 'open', slow_open)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.release.set()
+        self.patcher.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_background_startup_serves_ready_nodes(self):
+        manager = ReplicationManager(nodes_db=3, strategy='full', storage_engine='log', db_dir=self.tmp_dir,
+                                     startup='background')
+        try:
+            self.assertTrue(manager.wait_ready(2, timeout=5))
+            self.assertEqual([node['status'] for node in manager.get_nodes_status()], ['alive', 'alive', 'starting'])
+
+            # Le richieste vengono servite dai nodi pronti durante l'avvio del nodo 2.
+            manager.write_to_replicas('key_1', 'value_1')
+            manager.write_to_replicas('key_2', 'value_2')
+            manager.delete_from_replicas('key_2')
+            self.assertEqual(manager.read_from_replicas('key_1')['value'], 'value_1')
+
+            self.release.set()
+            self.assertTrue(manager.wait_ready(timeout=5))
+            # Il nodo 2 è stato allineato con le modifiche avvenute durante il suo avvio.
+            node = manager.nodes[2]
+            self.assertEqual(node.read('key_1'), 'value_1')
+            self.assertIsNone(node.read('key_2'))
+            self.assertTrue(all(status['ready'] for status in manager.get_nodes_status()))
+        finally:
+            manager.close()
+
+    def test_consistent_catch_up_keeps_only_owned_keys(self):
+        manager = ReplicationManager(nodes_db=3, strategy='consistent', replication_factor=2,
+                                     storage_engine='memory', db_dir=self.tmp_dir, startup='background')
+        try:
+            self.assertTrue(manager.wait_ready(2, timeout=5))
+            for i in range(20):
+                manager.write_to_replicas(f'key_{i}', f'value_{i}')
+            self.release.set()
+            self.assertTrue(manager.wait_ready(timeout=5))
+            node = manager.nodes[2]
+            owned = {f'key_{i}' for i in range(20) if node in manager.consistent_hash.get_nodes_for_key(f'key_{i}')}
+            self.assertTrue(owned)
+            self.assertEqual({key for key, _ in node.get_all_keys()}, owned)
+        finally:
+            manager.close()
+
+    def test_catch_up_does_not_block_ready_nodes(self):
+        manager = ReplicationManager(nodes_db=3, strategy='full', storage_engine='memory', db_dir=self.tmp_dir,
+                                     startup='background')
+        try:
+            self.assertTrue(manager.wait_ready(2, timeout=5))
+            manager.write_to_replicas('key_1', 'value_1')
+            node = manager.nodes[2]
+            replaying, resume = threading.Event(), threading.Event()
+            original_write_if_newer = node.write_if_newer
+
+            # La riapplicazione delle modifiche sul nodo 2 resta sospesa finché il test non la sblocca.
+            def slow_write_if_newer(*args, **kwargs):
+                replaying.set()
+                resume.wait(5)
+                return original_write_if_newer(*args, **kwargs)
+
+            with mock.patch.object(node, 'write_if_newer', slow_write_if_newer):
+                self.release.set()
+                self.assertTrue(replaying.wait(5))
+                # Durante l'allineamento i nodi pronti continuano a servire scritture e letture.
+                writer = threading.Thread(target=manager.write_to_replicas, args=('key_2', 'value_2'))
+                writer.start()
+                writer.join(5)
+                self.assertFalse(writer.is_alive())
+                self.assertEqual(manager.nodes[0].read('key_2'), 'value_2')
+                resume.set()
+                self.assertTrue(manager.wait_ready(timeout=5))
+            self.assertEqual(node.read('key_1'), 'value_1')
+            self.assertEqual(node.read('key_2'), 'value_2')
+        finally:
+            manager.close()
+
+    def test_ready_endpoint(self):
+        self.release.set()
+        app = create_app({'nodes_db': 3, 'port': 5000, 'API_TOKEN': 'token', 'storage_engine': 'memory',
+                          'startup': 'background'})
+        client = app.test_client()
+        response = client.get('/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(response.json['ready_nodes'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,298 @@
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.storage import create_engine, snapshot_files, LogStructuredEngine, PartitionedEngine
+
+
+# Test funzionali comuni a tutti i motori di storage
+class TestStorageEngines(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_write_read_delete(self):
+        for kind in ('sqlite', 'log', 'memory'):
+            with self.subTest(engine=kind):
+                engine = create_engine(kind, os.path.join(self.tmp_dir, f'node_{kind}'))
+                engine.write('key', 'value_1')
+                engine.write('key', 'value_2')
+                self.assertEqual(engine.read('key'), 'value_2')
+                self.assertTrue(engine.key_exists('key'))
+                engine.delete('key')
+                self.assertIsNone(engine.read('key'))
+                self.assertFalse(engine.key_exists('key'))
+                engine.write('other', 'x')
+                self.assertEqual(sorted(engine.items()), [('other', 'x')])
+                engine.close()
+
+    def test_persistence_after_reopen(self):
+        for kind in ('sqlite', 'log'):
+            with self.subTest(engine=kind):
+                base_path = os.path.join(self.tmp_dir, f'node_{kind}')
+                engine = create_engine(kind, base_path)
+                engine.write('kept', 'value')
+                engine.write('deleted', 'value')
+                engine.delete('deleted')
+                engine.close()
+
+                engine = create_engine(kind, base_path)
+                self.assertEqual(engine.read('kept'), 'value')
+                self.assertIsNone(engine.read('deleted'))
+                engine.close()
+
+    def test_versions_and_conditional_writes(self):
+        for kind in ('sqlite', 'log', 'memory'):
+            with self.subTest(engine=kind):
+                engine = create_engine(kind, os.path.join(self.tmp_dir, f'versions_{kind}'))
+                engine.write('key', 'value_1', 5)
+                self.assertEqual(tuple(engine.read_record('key')), ('value_1', 5, None))
+                self.assertFalse(engine.write_if_newer('key', 'stale', 4))
+                self.assertTrue(engine.write_if_newer('key', 'value_2', 6))
+                self.assertTrue(engine.write_if_newer('missing', 'value', 1))
+                self.assertEqual(sorted(engine.records()), [('key', 'value_2', 6, None), ('missing', 'value', 1, None)])
+                engine.close()
+
+    def test_tombstones(self):
+        for kind in ('sqlite', 'log', 'memory'):
+            with self.subTest(engine=kind):
+                base_path = os.path.join(self.tmp_dir, f'tombstones_{kind}')
+                engine = create_engine(kind, base_path)
+                engine.write('key', 'value', 5)
+                self.assertTrue(engine.write_if_newer('key', None, 6, time.time() + 3600))
+                self.assertIsNone(engine.read_record('key'))
+                self.assertFalse(engine.key_exists('key'))
+                self.assertEqual(engine.records(), [])
+                self.assertIsNone(engine.read_version('key')[0])
+                # Una copia più vecchia non fa rivivere la chiave cancellata.
+                self.assertFalse(engine.write_if_newer('key', 'value', 5))
+                self.assertTrue(engine.write_if_newer('key', 'newer', 7))
+                self.assertEqual(engine.read('key'), 'newer')
+                engine.close()
+
+                if kind != 'memory':
+                    engine = create_engine(kind, base_path)
+                    engine.write_if_newer('key', None, 8, time.time() + 3600)
+                    engine.close()
+                    engine = create_engine(kind, base_path)
+                    self.assertEqual(engine.read_version('key')[:2], (None, 8))
+                    self.assertFalse(engine.write_if_newer('key', 'value', 7))
+                    engine.close()
+
+    def test_expiry(self):
+        for kind in ('sqlite', 'log', 'memory'):
+            with self.subTest(engine=kind):
+                base_path = os.path.join(self.tmp_dir, f'expiry_{kind}')
+                engine = create_engine(kind, base_path)
+                now = time.time()
+                for i in range(5):
+                    engine.write(f'expired_{i}', 'value', 1, now - 1)
+                engine.write('alive', 'value', 1, now + 3600)
+                engine.write('forever', 'value', 1)
+                # Scadenza pigra: i record scaduti sono già invisibili prima del reaper.
+                self.assertIsNone(engine.read('expired_0'))
+                self.assertFalse(engine.key_exists('expired_0'))
+                self.assertEqual(sorted(key for key, _ in engine.items()), ['alive', 'forever'])
+                self.assertTrue(engine.write_if_newer('expired_1', 'rewritten', 0))
+
+                # Il reaper elimina a batch limitati.
+                self.assertEqual(engine.delete_expired(now, 3), 3)
+                self.assertEqual(engine.delete_expired(now, 3), 1)
+                self.assertEqual(engine.delete_expired(now, 3), 0)
+                self.assertEqual(engine.read('expired_1'), 'rewritten')
+                engine.close()
+
+                if kind != 'memory':
+                    engine = create_engine(kind, base_path)
+                    self.assertEqual(engine.read_record('alive')[2], now + 3600)
+                    self.assertIsNone(engine.read('expired_0'))
+                    engine.close()
+
+    def test_partitioned_engine(self):
+        for kind in ('sqlite', 'log'):
+            with self.subTest(engine=kind):
+                base_path = os.path.join(self.tmp_dir, f'partitioned_{kind}')
+                engine = create_engine(kind, base_path, partitions=4)
+                self.assertIsInstance(engine, PartitionedEngine)
+                now = time.time()
+                for i in range(40):
+                    engine.write(f'key_{i}', f'value_{i}', i)
+                engine.write('expired', 'value', 1, now - 1)
+                # Le chiavi sono distribuite su tutte le partizioni.
+                self.assertTrue(all(partition.items() for partition in engine.partitions))
+                self.assertEqual(len(engine.records()), 40)
+                self.assertTrue(engine.write_if_newer('key_1', 'newer', 100))
+                self.assertEqual(engine.delete_expired(now, 10), 1)
+
+                snapshot_path = os.path.join(self.tmp_dir, f'snapshot_{kind}.db')
+                engine.snapshot(snapshot_path)
+                engine.delete('key_1')
+                engine.restore(snapshot_path)
+                self.assertEqual(engine.read_record('key_1'), ('newer', 100, None))
+                engine.close()
+
+                engine = create_engine(kind, base_path, partitions=4)
+                self.assertEqual(sorted(engine.items())[:2], [('key_0', 'value_0'), ('key_1', 'newer')])
+                engine.close()
+
+    def test_partition_count_cannot_change(self):
+        for kind in ('sqlite', 'log'):
+            with self.subTest(engine=kind):
+                single = os.path.join(self.tmp_dir, f'single_{kind}')
+                create_engine(kind, single).close()
+                with self.assertRaises(ValueError):
+                    create_engine(kind, single, partitions=4)
+
+                partitioned = os.path.join(self.tmp_dir, f'partitioned_{kind}')
+                create_engine(kind, partitioned, partitions=4).close()
+                for partitions in (1, 2, 8):
+                    with self.assertRaises(ValueError):
+                        create_engine(kind, partitioned, partitions=partitions)
+                create_engine(kind, partitioned, partitions=4).close()
+
+    def test_partitioned_sqlite_snapshot_per_partition(self):
+        engine = create_engine('sqlite', os.path.join(self.tmp_dir, 'node'), partitions=4)
+        for i in range(20):
+            engine.write(f'key_{i}', f'value_{i}', i)
+        snapshot_path = os.path.join(self.tmp_dir, 'snapshot.db')
+        with unittest.mock.patch.object(PartitionedEngine, 'records') as row_copy:
+            engine.snapshot(snapshot_path)
+        row_copy.assert_not_called()  # Le partizioni vengono copiate con l'API di backup, non riga per riga.
+        self.assertEqual(len(snapshot_files(snapshot_path)), 5)
+
+        engine.write('key_0', 'changed', 100)
+        engine.restore(snapshot_path)
+        self.assertEqual(engine.read('key_0'), 'value_0')
+        self.assertEqual(len(engine.records()), 20)
+
+        # Uno snapshot con un altro numero di partizioni viene ridistribuito (cambio del numero di partizioni).
+        for partitions in (1, 2):
+            other = create_engine('sqlite', os.path.join(self.tmp_dir, f'other_{partitions}'), partitions=partitions)
+            other.restore(snapshot_path)
+            self.assertEqual(sorted(other.records()), sorted(engine.records()))
+            other.close()
+        engine.close()
+
+    def test_sqlite_reads_do_not_wait_for_the_write_lock(self):
+        engine = create_engine('sqlite', os.path.join(self.tmp_dir, 'node'))
+        engine.write('key', 'value', 1)
+        results = []
+        # Con la connessione di scrittura occupata le letture procedono sulle proprie connessioni, in parallelo.
+        with engine._lock:
+            readers = [threading.Thread(target=lambda: results.append(engine.read_record('key'))) for _ in range(4)]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join(5)
+            self.assertEqual(results, [('value', 1, None)] * 4)
+        engine.write('key', 'newer', 2)
+        self.assertEqual(engine.read('key'), 'newer')  # Le letture vedono le scritture già confermate.
+        engine.close()
+
+    def test_sqlite_schema_migration(self):
+        # Un database creato prima dell'introduzione delle versioni.
+        path = os.path.join(self.tmp_dir, 'legacy')
+        conn = sqlite3.connect(path + '.db')
+        conn.execute('''CREATE TABLE kv_store (key TEXT PRIMARY KEY, value TEXT)''')
+        conn.execute('''INSERT INTO kv_store (key, value) VALUES ('key', 'value')''')
+        conn.commit()
+        conn.close()
+
+        engine = create_engine('sqlite', path)
+        self.assertEqual(engine.read_record('key'), ('value', 0, None))
+        engine.close()
+
+    def test_log_compaction_keeps_live_values(self):
+        path = os.path.join(self.tmp_dir, 'node.log')
+        engine = LogStructuredEngine(path, compaction_min_bytes=0)
+        for i in range(200):
+            engine.write(f'key_{i % 10}', f'value_{i}')
+        engine.delete('key_0')
+        engine.compact()
+        self.assertLess(os.path.getsize(path), 10 * 64)
+        self.assertIsNone(engine.read('key_0'))
+        self.assertEqual(engine.read('key_9'), 'value_199')
+        engine.close()
+
+        engine = LogStructuredEngine(path)
+        self.assertEqual(len(engine.items()), 9)
+        self.assertEqual(engine.read('key_5'), 'value_195')
+        engine.close()
+
+    def test_log_hint_file(self):
+        path = os.path.join(self.tmp_dir, 'node.log')
+        engine = LogStructuredEngine(path)
+        now = time.time()
+        for i in range(10):
+            engine.write(f'key_{i}', f'value_{i}', i, now + 3600 if i % 2 else None)
+        engine.delete('key_0')
+        engine.close()
+        self.assertTrue(os.path.exists(path + '.hint'))
+
+        # L'indice viene caricato dall'hint senza leggere il log: il file viene aperto solo in append.
+        with unittest.mock.patch('builtins.open', wraps=open) as opened, \
+                unittest.mock.patch.object(LogStructuredEngine, '_iter_records') as scan:
+            engine = LogStructuredEngine(path)
+        scan.assert_not_called()
+        self.assertEqual([call[0][1] for call in opened.call_args_list if call[0][0] == path], ['ab'])
+        self.assertFalse(os.path.exists(path + '.hint'))
+        self.assertEqual(len(engine.items()), 9)
+        self.assertEqual(engine.read_record('key_5'), ('value_5', 5, now + 3600))
+        self.assertIsNone(engine.read('key_0'))
+        engine.close()
+
+        # Con una coda scritta dopo l'hint viene scandita solo quella.
+        hinted_size = os.path.getsize(path)
+        with open(path, 'ab') as f:
+            f.write(engine._encode('key_tail', 'value_tail', 20))
+        scan = unittest.mock.patch.object(LogStructuredEngine, '_iter_records', autospec=True,
+                                          side_effect=LogStructuredEngine._iter_records).start()
+        try:
+            engine = LogStructuredEngine(path)
+        finally:
+            unittest.mock.patch.stopall()
+        self.assertEqual(scan.call_args[0][2], hinted_size)
+        self.assertEqual(engine.read('key_tail'), 'value_tail')
+        self.assertEqual(len(engine.items()), 10)
+        engine.close()
+
+        # Un hint corrotto viene ignorato e l'indice ricostruito dal log.
+        with open(path + '.hint', 'r+b') as f:
+            f.seek(20)
+            f.write(b'\xff')
+        engine = LogStructuredEngine(path)
+        self.assertEqual(engine.read('key_9'), 'value_9')
+        self.assertEqual(len(engine.items()), 10)
+        engine.close()
+
+    def test_log_truncated_tail_is_discarded(self):
+        path = os.path.join(self.tmp_dir, 'node.log')
+        engine = LogStructuredEngine(path)
+        engine.write('a', 'value_a')
+        engine.write('b', 'value_b')
+        engine.close()
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 3)  # Simula un crash a metà scrittura.
+
+        engine = LogStructuredEngine(path)
+        self.assertEqual(engine.read('a'), 'value_a')
+        self.assertIsNone(engine.read('b'))
+        engine.write('b', 'value_b')
+        self.assertEqual(engine.read('b'), 'value_b')
+        engine.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
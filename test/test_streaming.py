@@ -0,0 +1,170 @@
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.models import CHUNK_PREFIX, ReplicaNode, ReplicationManager, chunk_key, manifest_key
+
+
+# Test dei valori grandi caricati e scaricati a chunk
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.replication_manager = ReplicationManager(nodes_db=3, strategy='full', storage_engine='memory')
+
+    def tearDown(self):
+        self.replication_manager.close()
+
+    def chunk_records(self, node):
+        return sorted(key for key, _ in node.get_all_keys() if key.startswith(CHUNK_PREFIX))
+
+    def test_write_and_read_stream(self):
+        manager = self.replication_manager
+        data = [os.urandom(1000) for _ in range(5)]
+        manifest = manager.write_stream('blob', iter(data))
+        self.assertEqual((manifest['chunks'], manifest['size']), (5, 5000))
+        self.assertEqual(b''.join(manager.iter_stream('blob', manager.read_stream_manifest('blob'))), b''.join(data))
+        # Ogni replica ha il manifest e tutti i chunk.
+        self.assertEqual([len(self.chunk_records(node)) for node in manager.nodes], [6] * 3)
+
+        # La sovrascrittura elimina i chunk della versione precedente.
+        manager.write_stream('blob', iter([b'small']))
+        self.assertEqual(b''.join(manager.iter_stream('blob', manager.read_stream_manifest('blob'))), b'small')
+        self.assertEqual([len(self.chunk_records(node)) for node in manager.nodes], [2] * 3)
+        with self.assertRaises(KeyError):
+            manager.read_chunk('blob', manifest['chunks_version'], 0)
+
+        self.assertTrue(manager.delete_stream('blob'))
+        self.assertFalse(manager.delete_stream('blob'))
+        self.assertIsNone(manager.read_stream_manifest('blob'))
+        self.assertEqual([self.chunk_records(node) for node in manager.nodes], [[]] * 3)
+
+    def test_interrupted_upload_keeps_previous_value(self):
+        manager = self.replication_manager
+        manager.write_stream('blob', iter([b'old']))
+
+        def chunks():
+            yield b'new'
+            raise IOError('client disconnected')
+
+        with self.assertRaises(IOError):
+            manager.write_stream('blob', chunks())
+        self.assertEqual(b''.join(manager.iter_stream('blob', manager.read_stream_manifest('blob'))), b'old')
+        self.assertEqual([len(self.chunk_records(node)) for node in manager.nodes], [2] * 3)
+
+    def test_chunks_are_removed_without_tombstones(self):
+        manager = self.replication_manager
+        replaced = manager.write_stream('blob', iter([b'a', b'b']))
+        deleted = manager.write_stream('blob', iter([b'c']))
+        manager.delete_stream('blob')
+        for node in manager.nodes:
+            self.assertEqual(node.engine.records(), [])
+            # Solo il manifest, la cui chiave viene riusata, lascia un tombstone; i chunk spariscono del tutto.
+            self.assertIsNone(node.read_version(manifest_key('blob'))[0])
+            for manifest in (replaced, deleted):
+                for index in range(manifest['chunks']):
+                    self.assertIsNone(node.read_version(chunk_key('blob', manifest['chunks_version'], index)))
+
+    def test_overlapping_uploads_keep_the_last_commit(self):
+        manager = ReplicationManager(nodes_db=3, strategy='async', storage_engine='memory', write_quorum=1)
+        try:
+            def first_upload():
+                yield b'first'
+                # Un secondo caricamento, iniziato dopo il primo, viene confermato prima.
+                manager.write_stream('blob', iter([b'second']))
+
+            first = manager.write_stream('blob', first_upload())
+            self.assertTrue(manager.replication_log.flush())
+            manifests = [json.loads(node.read(manifest_key('blob'))) for node in manager.nodes]
+            self.assertEqual([manifest['version'] for manifest in manifests], [first['version']] * 3)
+            self.assertEqual(b''.join(manager.iter_stream('blob', manager.read_stream_manifest('blob'))), b'first')
+            for node in manager.nodes:
+                self.assertEqual(len(self.chunk_records(node)), 2)
+        finally:
+            manager.close()
+
+    def test_cleanup_errors_do_not_hide_the_upload_error(self):
+        manager = self.replication_manager
+
+        def chunks():
+            yield b'data'
+            raise IOError('client disconnected')
+
+        with mock.patch.object(ReplicaNode, 'drop', side_effect=RuntimeError('storage error')):
+            with self.assertRaises(IOError):
+                manager.write_stream('blob', chunks())
+
+    def test_change_log_keeps_only_chunk_references(self):
+        manager = self.replication_manager
+        data = [os.urandom(64 * 1024) for _ in range(32)]
+        manager.write_stream('blob', iter(data))
+        # Il log delle modifiche non trattiene il contenuto dei chunk...
+        for node in manager.nodes:
+            self.assertLess(sum(len(change[3] or '') for change in node.change_log), 1024)
+        # ...che viene riletto dallo storage quando un altro nodo ne ha bisogno.
+        changes = manager.nodes[0].changes_since(0)
+        self.assertEqual(sum(1 for change in changes if change[2].startswith(CHUNK_PREFIX + 'blob/')), 32)
+        self.assertTrue(all(change[3] is not None for change in changes))
+
+    def test_async_followers_receive_chunks(self):
+        manager = ReplicationManager(nodes_db=3, strategy='async', storage_engine='memory', write_quorum=1)
+        try:
+            manager.write_stream('blob', iter([b'a' * 1000, b'b' * 1000]))
+            # In coda per i follower ci sono solo riferimenti ai chunk.
+            queued = [change for queue in manager.replication_log.queues.values() for _, change in queue]
+            self.assertTrue(all(change[2] is None for change in queued if change[0] == 'chunk'))
+            self.assertTrue(manager.replication_log.flush())
+            self.assertEqual([len(self.chunk_records(node)) for node in manager.nodes], [3] * 3)
+        finally:
+            manager.close()
+
+    def test_api(self):
+        app = create_app({'nodes_db': 3, 'port': 5000, 'API_TOKEN': 'token', 'storage_engine': 'memory'})
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer token'}
+        data = os.urandom(10000)
+        response = client.put('/stream/blob?chunk_size=4096', data=data, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json['chunks'], response.json['size']), (3, 10000))
+
+        response = client.get('/stream/blob', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, data)
+        self.assertEqual(response.headers['Content-Length'], '10000')
+
+        self.assertEqual(client.put('/stream/blob?chunk_size=0', data=b'x', headers=headers).status_code, 400)
+        self.assertEqual(client.delete('/delete/blob', headers=headers).status_code, 200)
+        self.assertEqual(client.get('/stream/blob', headers=headers).status_code, 404)
+        self.assertEqual(client.delete('/delete/blob', headers=headers).status_code, 404)
+
+    def test_api_keeps_value_kinds_apart(self):
+        app = create_app({'nodes_db': 3, 'port': 5000, 'API_TOKEN': 'token', 'storage_engine': 'memory'})
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer token'}
+        # Le chiavi con il prefisso riservato non sono scrivibili direttamente.
+        for path, body in (('/write', {'key': CHUNK_PREFIX + 'k', 'value': 'x'}),
+                           ('/cas', {'key': CHUNK_PREFIX + 'k', 'value': 'x', 'expected': None}),
+                           ('/incr', {'key': CHUNK_PREFIX + 'k'})):
+            self.assertEqual(client.post(path, json=body, headers=headers).status_code, 400)
+
+        # Un valore normale e uno in streaming non condividono la chiave.
+        client.post('/write', json={'key': 'plain', 'value': 'x'}, headers=headers)
+        self.assertEqual(client.put('/stream/plain', data=b'data', headers=headers).status_code, 409)
+        client.put('/stream/streamed', data=b'data', headers=headers)
+        self.assertEqual(client.post('/write', json={'key': 'streamed', 'value': 'x'}, headers=headers).status_code,
+                         409)
+
+        # /delete elimina entrambi i valori, se presenti.
+        client.post('/incr', json={'key': 'streamed'}, headers=headers)
+        self.assertEqual(client.delete('/delete/streamed', headers=headers).status_code, 200)
+        self.assertEqual(client.get('/read/streamed', headers=headers).status_code, 404)
+        self.assertEqual(client.get('/stream/streamed', headers=headers).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import cProfile
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+# Aggiungi il percorso del progetto alla variabile sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.models import ReplicationManager
+from app.profiling import Profiler
+from app.tracing import Tracer, current_request_id
+
+
+# Test delle trace delle richieste e del profiling su richiesta
+class TestTracing(unittest.TestCase):
+
+    def test_spans_cover_manager_and_nodes(self):
+        manager = ReplicationManager(nodes_db=3, strategy='full', storage_engine='memory', read_quorum=2)
+        tracer = Tracer(slow_threshold=0)
+        with tracer.trace('write', 'request-1'):
+            self.assertEqual(current_request_id(), 'request-1')
+            manager.write_if_absent('key', 'value')
+            manager.read_from_replicas('key')
+        self.assertIsNone(current_request_id())
+        trace = tracer.slow_requests[0]
+        names = [span['name'] for span in trace['spans']]
+        for name in ('manager.lock_wait', 'manager.exists_check', 'manager.ring_lookup', 'node.write', 'node.read'):
+            self.assertIn(name, names)
+        # Le letture in quorum avvengono in altri thread ma restano nella trace della richiesta.
+        self.assertEqual(sum(1 for name in names if name == 'node.read'), 2)
+        self.assertEqual({span['node'] for span in trace['spans'] if span['name'] == 'node.write'}, {0, 1, 2})
+        manager.close()
+
+    def test_unsampled_requests_are_not_logged(self):
+        tracer = Tracer(sample_rate=0, slow_threshold=0)
+        with tracer.trace('read'):
+            self.assertIsNotNone(current_request_id())
+        self.assertEqual(len(tracer.slow_requests), 0)
+
+    def test_api_request_id_and_profile(self):
+        app = create_app({'nodes_db': 3, 'port': 5000, 'API_TOKEN': 'token', 'storage_engine': 'memory',
+                          'tracing': {'slow_threshold': 0}})
+        client = app.test_client()
+        headers = {'Authorization': 'Bearer token'}
+        response = client.post('/write', json={'key': 'key', 'value': 'value'},
+                               headers={**headers, 'X-Request-ID': 'abc'})
+        self.assertEqual(response.headers['X-Request-ID'], 'abc')
+        slow = client.get('/traces/slow', headers=headers).json['requests']
+        self.assertEqual(slow[0]['request_id'], 'abc')
+        self.assertIn('route.write', [span['name'] for span in slow[0]['spans']])
+
+        # Una richiesta servita durante la sessione cProfile compare nel report.
+        reader = threading.Timer(0.05, lambda: app.test_client().get('/read/key', headers=headers))
+        reader.start()
+        response = client.post('/profile', json={'mode': 'cprofile', 'seconds': 0.3}, headers=headers)
+        reader.join()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('read_from_replicas', response.get_data(as_text=True))
+        response = client.post('/profile', json={'mode': 'sampling', 'seconds': 0.1}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.post('/profile', json={'mode': 'other'}, headers=headers).status_code, 400)
+
+
+    def test_single_profiler_with_sys_monitoring(self):
+        # Simula Python 3.12+: un secondo profiler abilitato mentre un altro è attivo solleva ValueError.
+        created = []
+
+        class MonitoringProfile(cProfile.Profile):
+            active = None
+
+            def __init__(self):
+                super().__init__()
+                created.append(self)
+
+            def enable(self):
+                if MonitoringProfile.active is not None:
+                    raise ValueError('Another profiling tool is already active')
+                MonitoringProfile.active = self
+                super().enable()
+
+            def disable(self):
+                super().disable()
+                MonitoringProfile.active = None
+
+        profiler = Profiler()
+        errors = []
+
+        def handle_request():
+            try:
+                with profiler.request():
+                    sum(range(1000))
+            except ValueError as e:
+                errors.append(e)
+
+        with mock.patch('app.profiling.PROCESS_WIDE', True), mock.patch('cProfile.Profile', MonitoringProfile):
+            requests = [threading.Timer(0.05, handle_request) for _ in range(4)]
+            for timer in requests:
+                timer.start()
+            report = profiler.run('cprofile', 0.2)
+            for timer in requests:
+                timer.join()
+            # Le richieste concorrenti non abilitano altri profiler: c'è un solo profiler per la sessione.
+            self.assertEqual((errors, len(created)), ([], 1))
+            self.assertIn('function calls', report)
+
+            # Un profiler già attivo nel processo fa rifiutare la sessione.
+            other = MonitoringProfile()
+            other.enable()
+            try:
+                with self.assertRaises(RuntimeError):
+                    profiler.run('cprofile', 0.1)
+            finally:
+                other.disable()
+
+
+if __name__ == '__main__':
+    unittest.main()